@@ -0,0 +1,103 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+from typing import Tuple
+from graph_board import GraphBoard, GraphPresets as gp
+from rule_engines import GraphRuleEngine
+from movement import RuleSet, Moveset, MovesetPresets as mp, Move
+from teams import Team, TeamPresets as tp
+from variants import Variants
+
+# Games are built without importing any of the render engines, so they can be used headlessly
+class GamePresets:
+    def standard() -> Tuple[GraphBoard, GraphRuleEngine]:
+        return gp.standard_board(), GraphRuleEngine()
+
+    def corner() -> Tuple[GraphBoard, GraphRuleEngine]:
+        board = gp.corner_board('white', 'red')
+        rule_engine = GraphRuleEngine(
+            teams=Team.team_dict(tp.WHITE, tp.RED),
+            promotion_tiles={
+                'white': [(0, i) for i in range(4)],
+                'red': [(i, 0) for i in range(4)]
+            },
+            lose={'white': 'eliminate_pieces', 'red': 'eliminate_royals'})
+        return board, rule_engine
+
+    def glinski() -> Tuple[GraphBoard, GraphRuleEngine]:
+        game = Variants.load_headless('hex/glinski')
+        return game.board, game.rule_engine
+
+    def wrapped() -> Tuple[GraphBoard, GraphRuleEngine]:
+        board = gp.wrapped_board()
+
+        condition = 'lambda board, position, team, teams:'
+        right = 'position in [(7+i, 3) for i in range(4)]'
+        left = 'position in [(7+i, 0) for i in range(4)]'
+        front = 'position in [(10, i) for i in range(4)]'
+        back = 'position in [(7, i) for i in range(4)]'
+        center = 'position in [(7+i, j) for i in range(4) for j in range(4)]'
+
+        north = 'board.get_node_piece(position).facing == "n"'
+        south = 'board.get_node_piece(position).facing == "s"'
+        east = 'board.get_node_piece(position).facing == "e"'
+        west = 'board.get_node_piece(position).facing == "w"'
+
+        white = '"white" in team'
+        black = '"black" in team'
+
+        def orc(*conditions):
+            return ' or '.join(conditions)
+
+        PAWN_CAPTURE_LEFT = Moveset([Move(('fr', 'vertex'))], 1, False, True, condition_requirement=f'{condition} not ({" and ".join([left, north, black])}) and not ({" and ".join([right, south, white])}) and not ({" and ".join([back, east, white])}) and not ({" and ".join([front, west, black])})')
+        PAWN_CAPTURE_RIGHT = Moveset([Move(('fl', 'vertex'))], 1, False, True, condition_requirement=f'{condition} not ({" and ".join([right, north, white])}) and not ({" and ".join([left, south, black])}) and not ({" and ".join([front, east, black])}) and not ({" and ".join([back, west, white])})')
+
+        PAWN_MOVE_LEFT = Moveset([Move(('r', 'edge'), end_direction='r')], 1, True, False, condition_requirement=f'{condition} {" and ".join([center, f"({orc(north, south)})"])}')
+        PAWN_MOVE_RIGHT = Moveset([Move(('l', 'edge'), end_direction='l')], 1, True, False, condition_requirement=f'{condition} {" and ".join([center, f"({orc(east, west)})"])}')
+
+        rule_engine = GraphRuleEngine(RuleSet.rule_dict(
+            RuleSet('pawn', 10, [mp.PAWN_MOVE, PAWN_MOVE_LEFT, PAWN_MOVE_RIGHT, PAWN_CAPTURE_LEFT, PAWN_CAPTURE_RIGHT], 'queen')
+        ),
+            promotion_tiles={
+            'white': [(13, i) for i in range(4)] + [(14, i) for i in range(4)],
+            'black': [(3, i) for i in range(4)] + [(4, i) for i in range(4)]
+        })
+        return board, rule_engine
+
+    def load(name) -> Tuple[GraphBoard, GraphRuleEngine]:
+        # Accepts a preset above, a saved preset such as 'hex/glinski' or a path to a .ucbgame file
+        if name in PRESETS:
+            board, rule_engine = PRESETS[name]()
+            if rule_engine.book_path == None:
+                rule_engine.book_path = f'saved/books/{name}.ucbbook'
+            if rule_engine.tablebase_dir == None:
+                rule_engine.tablebase_dir = f'saved/tablebases/{name}'
+            return board, rule_engine
+        if os.path.isfile(name):
+            game = Variants.read_headless(name)
+        else:
+            game = Variants.load_headless(name)
+        return game.board, game.rule_engine
+
+
+PRESETS = {
+    'standard': GamePresets.standard,
+    'corner': GamePresets.corner,
+    'glinski': GamePresets.glinski,
+    'hex': GamePresets.glinski,
+    'wrapped': GamePresets.wrapped
+}
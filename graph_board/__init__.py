@@ -1,2 +1,3 @@
 from .graph_board import GraphBoard, GraphPresets
-from .direction_graph import DirectionGraph, DirectionPresets
\ No newline at end of file
+from .direction_graph import DirectionGraph, DirectionPresets
+from .compiled_topology import CompiledTopology
\ No newline at end of file
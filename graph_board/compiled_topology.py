@@ -0,0 +1,297 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+from array import array
+from collections import OrderedDict, deque
+
+# Memory for cached distance rows, a full matrix fits for boards up to a couple of thousand tiles
+DISTANCE_CACHE_BYTES = 16 * 1024 * 1024
+
+
+class CompiledTopology:
+    def __init__(self, board):
+        # Dense ids for positions
+        self.positions = list(board.nodes.keys())
+        self.position_ids = {position: i for i, position in enumerate(self.positions)}
+
+        # Int codes for adjacency types
+        self.adjacency_types = list(board.adjacency_graphs.keys())
+        for node in board.nodes.values():
+            for adjacency_type in node.adjacencies.keys():
+                if adjacency_type not in self.adjacency_types:
+                    self.adjacency_types.append(adjacency_type)
+        self.adjacency_type_codes = {adjacency_type: i for i, adjacency_type in enumerate(self.adjacency_types)}
+
+        # Int codes for directions come from the frozen DirectionGraph, followed by any
+        # non-directional adjacency keys (e.g. 'warp')
+        directions = board.directions
+        if not directions.frozen:
+            directions.freeze()
+        self.directions = list(directions.direction_names)
+        for node in board.nodes.values():
+            for adjacencies in node.adjacencies.values():
+                for direction in adjacencies.keys():
+                    if direction not in self.directions:
+                        self.directions.append(direction)
+        self.direction_codes = {direction: i for i, direction in enumerate(self.directions)}
+        self.relative_directions = directions.relative_names
+        self.relative_codes = directions.relative_codes
+        self.included_adjacency_types = list(directions.included_adjacency_types)
+
+        node_count = len(self.positions)
+        direction_count = len(self.directions)
+        relative_count = directions.relative_count
+        self.node_count = node_count
+        self.direction_count = direction_count
+        self.relative_count = relative_count
+
+        # direction x relative direction -> direction, -1 where undefined
+        self.relative_table = array('l', directions.relative_table)
+        self.relative_table.extend([-1] * ((direction_count - len(directions.direction_names)) * relative_count))
+
+        # CSR neighbour tables, slot (type * nodes + node) * directions + direction spans offsets[slot]:offsets[slot + 1]
+        self.offsets = array('l', [0]) * (len(self.adjacency_types) * node_count * direction_count + 1)
+        self.neighbors = array('l')
+        # Per edge: relative code of its change_direction_to (-1 for none) and the direction it leaves you moving in
+        self.edge_changes = array('l')
+        self.edge_directions = array('l')
+
+        slot = 0
+        for adjacency_type in self.adjacency_types:
+            for position in self.positions:
+                adjacencies = board.nodes[position].adjacencies.get(adjacency_type, dict())
+                for direction_index, direction in enumerate(self.directions):
+                    for _, neighbor_position, change_direction in adjacencies.get(direction, []):
+                        if change_direction == None or change_direction == 'f':
+                            change = -1
+                            new_direction = direction_index
+                        else:
+                            change = self.relative_codes.get(change_direction, -1)
+                            new_direction = self.get_direction_code_from_relative(direction_index, change)
+                        self.neighbors.append(self.position_ids[neighbor_position])
+                        self.edge_changes.append(change)
+                        self.edge_directions.append(new_direction)
+                    slot += 1
+                    self.offsets[slot] = len(self.neighbors)
+
+        self.compiled_moves = dict()
+        # Per moves list and branching mode: (moves, trie, first steps, rays), the last two indexed by node * direction_count + facing
+        self.movesets = dict()
+
+        # Distance rows use the smallest unsigned type that fits, with its largest value meaning unreachable
+        self.distance_typecode = 'B' if node_count < 0xFF else 'H' if node_count < 0xFFFF else 'L'
+        self.unreachable = (1 << (8 * array(self.distance_typecode).itemsize)) - 1
+        self.adjacency_lists = dict()
+        self.distance_rows = OrderedDict()
+        self.distance_cache_rows = max(64, DISTANCE_CACHE_BYTES // max(node_count * array(self.distance_typecode).itemsize, 1))
+
+    def get_direction_code_from_relative(self, direction, relative_direction):
+        if direction < 0 or relative_direction < 0:
+            return -1
+        return self.relative_table[direction * self.relative_count + relative_direction]
+
+    def get_neighbors(self, node, adjacency_type, direction):
+        slot = (adjacency_type * self.node_count + node) * self.direction_count + direction
+        return range(self.offsets[slot], self.offsets[slot + 1])
+
+    def get_adjacency_list(self, adjacency_type):
+        # Distinct neighbour ids of every node over one adjacency type, in any direction
+        if adjacency_type in self.adjacency_lists:
+            return self.adjacency_lists[adjacency_type]
+
+        adjacency_list = []
+        type_code = self.adjacency_type_codes.get(adjacency_type)
+        for node in range(self.node_count):
+            node_neighbors = []
+            if type_code != None:
+                start = self.offsets[(type_code * self.node_count + node) * self.direction_count]
+                end = self.offsets[(type_code * self.node_count + node + 1) * self.direction_count]
+                for neighbor in self.neighbors[start:end]:
+                    if neighbor != node and neighbor not in node_neighbors:
+                        node_neighbors.append(neighbor)
+            adjacency_list.append(tuple(node_neighbors))
+
+        self.adjacency_lists[adjacency_type] = adjacency_list
+        return adjacency_list
+
+    def get_distance_row(self, node, adjacency_type='edge'):
+        # BFS distances from node to every node, rows are kept in an LRU cache
+        key = (adjacency_type, node)
+        row = self.distance_rows.get(key)
+        if row != None:
+            self.distance_rows.move_to_end(key)
+            return row
+
+        adjacency_list = self.get_adjacency_list(adjacency_type)
+        row = array(self.distance_typecode, [self.unreachable]) * self.node_count
+        row[node] = 0
+        queue = deque([node])
+        while queue:
+            current = queue.popleft()
+            distance = row[current] + 1
+            for neighbor in adjacency_list[current]:
+                if row[neighbor] == self.unreachable:
+                    row[neighbor] = distance
+                    queue.append(neighbor)
+
+        self.distance_rows[key] = row
+        if len(self.distance_rows) > self.distance_cache_rows:
+            self.distance_rows.popitem(last=False)
+        return row
+
+    def get_distance_matrix(self, adjacency_type='edge'):
+        return [self.get_distance_row(node, adjacency_type) for node in range(self.node_count)]
+
+    def get_distance(self, position1, position2, adjacency_type='edge'):
+        # Number of adjacency_type steps between two positions, None if position2 cannot be reached
+        distance = self.get_distance_row(self.position_ids[position1], adjacency_type)[self.position_ids[position2]]
+        return None if distance == self.unreachable else distance
+
+    def is_reachable(self, position1, position2, adjacency_type='edge'):
+        return self.get_distance(position1, position2, adjacency_type) != None
+
+    def compile_move(self, move):
+        if move in self.compiled_moves:
+            return self.compiled_moves[move]
+
+        steps = []
+        for relative_direction, adjacency_type in move.sequence:
+            if adjacency_type not in self.adjacency_type_codes:
+                self.compiled_moves[move] = None
+                return None
+            type_code = self.adjacency_type_codes[adjacency_type]
+            if adjacency_type in self.included_adjacency_types:
+                steps.append((type_code, True, self.relative_codes.get(relative_direction, -1)))
+            else:
+                steps.append((type_code, False, self.direction_codes.get(relative_direction, -1)))
+        compiled = (tuple(steps), self.relative_codes.get(move.end_direction, -1))
+
+        self.compiled_moves[move] = compiled
+        return compiled
+
+    def compile_trie(self, moves):
+        # Moves sharing leading steps (e.g. most knight moves start with the same two) share a path, so each prefix
+        # is walked once per origin. A trie node is (children by compiled step, [(move index, end direction)])
+        root = (dict(), [])
+        for i, move in enumerate(moves):
+            compiled = self.compile_move(move)
+            if compiled == None:
+                continue
+            steps, end_direction = compiled
+            trie_node = root
+            for step in steps:
+                trie_node = trie_node[0].setdefault(step, (dict(), []))
+            trie_node[1].append((i, end_direction))
+        return root
+
+    def get_moveset(self, moves, branching=False):
+        # Keyed by identity since moves lists are not hashable, the stored list guards against a reused id
+        key = (id(moves), branching)
+        moveset = self.movesets.get(key)
+        if moveset == None or moveset[0] is not moves:
+            size = self.node_count * self.direction_count
+            moveset = (moves, self.compile_trie(moves), [None] * size, [None] * size)
+            self.movesets[key] = moveset
+        return moveset
+
+    def walk_trie(self, trie, move_count, node, facing, branching=False):
+        # Integer equivalent of Move.get_end_position for every move at once, returns each move's (node, facing, last movement)
+        # results. Only the first neighbour in a direction is followed, as there, unless branching, which follows all of them
+        # like Move.get_intermediate_position
+        results = [[] for _ in range(move_count)]
+        if facing < 0:
+            return results
+        relative_table = self.relative_table
+        relative_count = self.relative_count
+        node_count = self.node_count
+        direction_count = self.direction_count
+        offsets = self.offsets
+        neighbors = self.neighbors
+
+        stack = [(trie, node, facing, facing)]
+        while stack:
+            (children, ends), node, direction, facing = stack.pop()
+            for i, end_direction in ends:
+                end_facing = relative_table[facing * relative_count + end_direction] if end_direction >= 0 else facing
+                results[i].append((node, end_facing, direction))
+
+            for (type_code, relative, code), child in children.items():
+                if relative:
+                    if direction < 0 or code < 0:
+                        continue
+                    new_direction = relative_table[direction * relative_count + code]
+                else:
+                    new_direction = code
+                if new_direction < 0:
+                    continue
+                slot = (type_code * node_count + node) * direction_count + new_direction
+                first = offsets[slot]
+                last = offsets[slot + 1] if branching else min(first + 1, offsets[slot + 1])
+                for edge in range(first, last):
+                    change = self.edge_changes[edge]
+                    if change >= 0:
+                        edge_direction = self.edge_directions[edge]
+                        edge_facing = relative_table[facing * relative_count + change]
+                        if edge_direction < 0 or edge_facing < 0:
+                            continue
+                        stack.append((child, neighbors[edge], edge_direction, edge_facing))
+                    else:
+                        stack.append((child, neighbors[edge], new_direction, facing))
+        return results
+
+    def get_moveset_steps(self, moves, node, facing, branching=False):
+        # Each move's results from (node, facing) on an empty board, walked once per origin
+        _, trie, steps, _ = self.get_moveset(moves, branching)
+        index = node * self.direction_count + facing
+        result = steps[index]
+        if result == None:
+            result = tuple(tuple(move_steps) for move_steps in self.walk_trie(trie, len(moves), node, facing, branching))
+            steps[index] = result
+        return result
+
+    def get_moveset_rays(self, moves, node, facing, branching=False):
+        # The steps each move repeats through from (node, facing) on an empty board, in move order, so sliding and jumping
+        # moves only scan them until blocked. A ray ends where the walk leaves the board or reaches a node and facing it
+        # already passed through, since from there it only repeats. With branching a move gives one ray per path
+        if facing < 0:
+            return ()
+        _, _, _, rays = self.get_moveset(moves, branching)
+        index = node * self.direction_count + facing
+        result = rays[index]
+        if result != None:
+            return result
+
+        result = []
+        for i in range(len(moves)):
+            stack = [(node, facing, ())]
+            while stack:
+                ray_node, ray_facing, ray = stack.pop()
+                following = []
+                if ray_facing >= 0:
+                    visited = [(step[0], step[1]) for step in ray]
+                    for step in self.get_moveset_steps(moves, ray_node, ray_facing, branching)[i]:
+                        if (step[0], step[1]) not in visited:
+                            following.append(step)
+                if not following:
+                    if ray:
+                        result.append(ray)
+                    continue
+                for step in reversed(following):
+                    stack.append((step[0], step[1], ray + (step,)))
+
+        result = tuple(result)
+        rays[index] = result
+        return result
@@ -15,6 +15,7 @@ limitations under the License.
 '''
 
 from nodes import DirectionNode
+from array import array
 
 class DirectionGraph:
     def __init__(self, included_adjacency_types=None):
@@ -24,49 +25,92 @@ class DirectionGraph:
             self.included_adjacency_types = ['edge', 'vertex']
         else:
             self.included_adjacency_types = included_adjacency_types
+        self.frozen = False
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.freeze()
 
     def add_node(self, node: DirectionNode):
         self.nodes[node.direction] = node
+        self.frozen = False
 
     def add_relation(self, node1: str, node2: str, relative_direction):
         self.relations[(node1, node2)] = relative_direction
         self.nodes[node1].adjacencies[relative_direction] = self.nodes[node2]
+        self.frozen = False
+
+    def freeze(self):
+        # Direction names are only kept at the API boundary, lookups go through the int table
+        self.direction_names = list(self.nodes.keys())
+        self.direction_codes = {direction: i for i, direction in enumerate(self.direction_names)}
+        self.relative_names = []
+        for node in self.nodes.values():
+            for relative_direction in node.adjacencies.keys():
+                if relative_direction not in self.relative_names:
+                    self.relative_names.append(relative_direction)
+        self.relative_codes = {relative_direction: i for i, relative_direction in enumerate(self.relative_names)}
+        self.relative_count = len(self.relative_names)
+
+        self.relative_table = array('l', [-1]) * (len(self.direction_names) * self.relative_count)
+        for direction, node in self.nodes.items():
+            for relative_direction, other_node in node.adjacencies.items():
+                index = self.direction_codes[direction] * self.relative_count + self.relative_codes[relative_direction]
+                self.relative_table[index] = self.direction_codes[other_node.direction]
+
+        self.frozen = True
+        return self
+
+    def get_direction_code_from_relative(self, direction: int, relative_direction: int) -> int:
+        if direction < 0 or relative_direction < 0:
+            return -1
+        return self.relative_table[direction * self.relative_count + relative_direction]
 
     def get_direction_from_relative(self, node1: str, relative_direction):
-        return self.nodes[node1].adjacencies[relative_direction].direction
+        if not self.frozen:
+            self.freeze()
+        direction = self.relative_table[self.direction_codes[node1] * self.relative_count + self.relative_codes[relative_direction]]
+        if direction < 0:
+            raise KeyError(relative_direction)
+        return self.direction_names[direction]
     
     def get_opposite_direction(self, direction):
         return self.get_direction_from_relative(direction, 'b')
     
 class DirectionPresets:
-    def cartesian_2d():
-        directions = DirectionGraph()
-        cardinal_directions = ['n', 'ne', 'e', 'se', 's', 'sw', 'w', 'nw']
-        relative_directions = ['f', 'fr', 'r', 'br', 'b', 'bl', 'l', 'fl']
-        for direction in cardinal_directions:
-            directions.add_node(DirectionNode(direction))
+    def cyclic_2d(directions, relative_directions) -> DirectionGraph:
+        # Relative direction i from direction j is direction (i + j), so the table is filled arithmetically
+        graph = DirectionGraph()
+        for direction in directions:
+            graph.nodes[direction] = DirectionNode(direction)
 
-        for direction_index in range(len(cardinal_directions)):
+        for direction_index in range(len(directions)):
             for relative_direction_index in range(len(relative_directions)):
-                directions.add_relation(
-                    cardinal_directions[direction_index], 
-                    cardinal_directions[(direction_index + relative_direction_index) % len(cardinal_directions)], 
-                    relative_directions[relative_direction_index])
+                direction = directions[direction_index]
+                other_direction = directions[(direction_index + relative_direction_index) % len(directions)]
+                graph.relations[(direction, other_direction)] = relative_directions[relative_direction_index]
+                graph.nodes[direction].adjacencies[relative_directions[relative_direction_index]] = graph.nodes[other_direction]
 
-        return directions
+        graph.direction_names = list(directions)
+        graph.direction_codes = {direction: i for i, direction in enumerate(directions)}
+        graph.relative_names = list(relative_directions)
+        graph.relative_codes = {relative_direction: i for i, relative_direction in enumerate(relative_directions)}
+        graph.relative_count = len(relative_directions)
+        graph.relative_table = array('l', [
+            (direction_index + relative_direction_index) % len(directions)
+            for direction_index in range(len(directions))
+            for relative_direction_index in range(len(relative_directions))
+        ])
+        graph.frozen = True
+
+        return graph
+
+    def cartesian_2d():
+        cardinal_directions = ['n', 'ne', 'e', 'se', 's', 'sw', 'w', 'nw']
+        relative_directions = ['f', 'fr', 'r', 'br', 'b', 'bl', 'l', 'fl']
+        return DirectionPresets.cyclic_2d(cardinal_directions, relative_directions)
 
     def hexagonal_2d():
-        directions = DirectionGraph()
         ordinal_directions  = ['n', 'nne', 'ne', 'e', 'se', 'sse', 's', 'ssw', 'sw', 'w', 'nw', 'nnw']
         relative_directions = ['f', 'ffr', 'fr', 'r', 'br', 'bbr', 'b', 'bbl', 'bl', 'l', 'fl', 'ffl']
-        for direction in ordinal_directions:
-            directions.add_node(DirectionNode(direction))
-
-        for direction_index in range(len(ordinal_directions)):
-            for relative_direction_index in range(len(relative_directions)):
-                directions.add_relation(
-                    ordinal_directions[direction_index], 
-                    ordinal_directions[(direction_index + relative_direction_index) % len(ordinal_directions)], 
-                    relative_directions[relative_direction_index])
-                
-        return directions
\ No newline at end of file
+        return DirectionPresets.cyclic_2d(ordinal_directions, relative_directions)
\ No newline at end of file
@@ -15,12 +15,15 @@ limitations under the License.
 '''
 
 from graph_board.direction_graph import DirectionGraph, DirectionPresets as dp
+from graph_board.zobrist import piece_key, turn_key
+from graph_board.compiled_topology import CompiledTopology
 from nodes import TileNode
 import networkx as nx
 import matplotlib.pyplot as plt
 from typing import List, Dict, Any
 from tile import Tile
 from piece import Piece
+from board_builder_utils import BoardBuilderUtils as bbu
 import math
 
 
@@ -29,6 +32,10 @@ class GraphBoard:
         self.nodes: Dict[Any, TileNode] = dict()
         self.current_team_index = current_team_index
         self.royal_tiles = dict()
+        self.piece_hash = 0
+        self.piece_keys = dict()
+        self.piece_teams = dict()
+        self.team_pieces = dict()
         if adjacency_types == None:
             self.adjacency_graphs = {'edge': dict(), 'vertex': dict()}
         else:
@@ -40,6 +47,60 @@ class GraphBoard:
             self.directions = directions
 
         self.tile_textures = []
+        self.compiled_topology = None
+        # Set by the rule engine when moves are generated with check, rebuilt whenever it no longer matches the pieces
+        self.attack_map = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['compiled_topology'] = None
+        state['attack_map'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compiled_topology = None
+        self.attack_map = None
+        self.reindex()
+
+    def compile(self) -> CompiledTopology:
+        if self.compiled_topology == None:
+            self.compiled_topology = CompiledTopology(self)
+        return self.compiled_topology
+
+    @property
+    def zobrist_hash(self) -> int:
+        return self.piece_hash ^ turn_key(self.current_team_index)
+
+    def reindex(self):
+        self.piece_hash = 0
+        self.piece_keys = dict()
+        self.piece_teams = dict()
+        self.team_pieces = dict()
+        for position in self.nodes.keys():
+            self._index_piece(position, self.get_node_piece(position))
+
+    def _index_piece(self, position, piece):
+        if piece == None:
+            return
+        key = piece_key(position, piece)
+        self.piece_keys[position] = key
+        self.piece_hash ^= key
+
+        teams = piece.get_team_names()
+        self.piece_teams[position] = teams
+        for team in teams:
+            if team not in self.team_pieces:
+                self.team_pieces[team] = set()
+            self.team_pieces[team].add(position)
+
+    def _unindex_piece(self, position):
+        key = self.piece_keys.pop(position, None)
+        if key != None:
+            self.piece_hash ^= key
+
+        for team in self.piece_teams.pop(position, []):
+            self.team_pieces[team].discard(position)
 
     def get_direction_from_relative(self, forward_direction, relative_direction):
         return self.directions.get_direction_from_relative(forward_direction, relative_direction)
@@ -49,7 +110,11 @@ class GraphBoard:
             tint = (0.9, 0.9, 0.9) if (position[0] + position[1]) % 2 == 0 else (0.7, 0.7, 0.7)
         tile.tint = tint
         node = TileNode(position, tile, render_polygon=render_polygon, texture_quad=texture_quad, texture_size=texture_size)
+        self._unindex_piece(position)
         self.nodes[position] = node
+        self.compiled_topology = None
+        if tile != None:
+            self._index_piece(position, tile.piece)
         if tile != None and tile.piece != None and tile.piece.is_royal:
             for team in tile.piece.get_team_names():
                 if team not in self.royal_tiles:
@@ -61,7 +126,11 @@ class GraphBoard:
 
     def combine_graphs(self, other_graph):
         # Combine the nodes from the other graph into this graph
+        for position in other_graph.nodes.keys():
+            self._unindex_piece(position)
         self.nodes.update(other_graph.nodes)
+        for position in other_graph.nodes.keys():
+            self._index_piece(position, other_graph.get_node_piece(position))
         
         # Combine adjacency graphs of each adjacency type from the other graph into this graph
         for adjacency_type, other_adjacency_graph in other_graph.adjacency_graphs.items():
@@ -91,10 +160,12 @@ class GraphBoard:
             self.nodes[position1].adjacencies[adjacency_type][direction] = []
         self.nodes[position1].adjacencies[adjacency_type][direction].append((self.nodes[position2], position2, change_direction_to))
         self.adjacency_graphs[adjacency_type][(position1, position2)] = (self.nodes[position1], self.nodes[position2])
+        self.compiled_topology = None
 
     def remove_adjacency(self, position1, position2, adjacency_type, direction):
         self.nodes[position1].adjacencies[adjacency_type][direction].pop((self.nodes[position2], position2, 'f'))
         self.adjacency_graphs[adjacency_type].pop((position1, position2))
+        self.compiled_topology = None
 
     def get_node_adjacencies(self, position, adjacency_type):
         position = position
@@ -167,21 +238,55 @@ class GraphBoard:
         return (hull_tuple, center)
 
 
-    def copy(self):
+    def copy(self, copy_pieces=False):
         new_board = GraphBoard(self.adjacency_graphs.keys(), self.directions, self.current_team_index)
         for position, node in self.nodes.items():
-            new_board.add_node(position, node.tile.copy(), node.tile.tint, node.render_polygon, node.texture_quad)
+            tile = node.tile.copy()
+            if copy_pieces and tile.piece != None:
+                tile.piece = tile.piece.copy()
+            new_board.add_node(position, tile, node.tile.tint, node.render_polygon, node.texture_quad)
             new_board.get_node(position).adjacencies = node.adjacencies
 
         new_board.adjacency_graphs = self.adjacency_graphs
+        new_board.compiled_topology = self.compiled_topology
         for team in self.royal_tiles:
             if team not in new_board.royal_tiles:
                 new_board.royal_tiles[team] = []
         return new_board
     
+    def to_compact(self):
+        # Topology, tiles and pieces without the networkx or rendering data, for sending boards to other processes
+        tiles = []
+        adjacencies = []
+        for position, node in self.nodes.items():
+            tile = node.tile
+            piece = tile.piece.to_compact() if tile.piece != None else None
+            tiles.append((position, tile.type, tile.texture, tile.disallowed_pieces, tile.not_selectable, piece))
+            for adjacency_type, directions in node.adjacencies.items():
+                for direction, neighbors in directions.items():
+                    for _, position2, change_direction_to in neighbors:
+                        adjacencies.append((position, position2, adjacency_type, direction, change_direction_to))
+        return (list(self.adjacency_graphs.keys()), self.directions, self.current_team_index, tiles, adjacencies)
+
+    def get_piece_state(self):
+        pieces = tuple((position, self.get_node_piece(position).to_compact()) for position in self.piece_keys.keys())
+        return (self.current_team_index, pieces)
+
+    def set_piece_state(self, state):
+        current_team_index, pieces = state
+        self.clear_pieces()
+        self.royal_tiles = {team: [] for team in self.royal_tiles}
+        for position, piece in pieces:
+            self.set_node_piece(position, Piece(*piece))
+        self.current_team_index = current_team_index
+
     def clear_pieces(self):
         for position in self.nodes.keys():
             self.get_node_tile(position).piece = None
+        self.piece_hash = 0
+        self.piece_keys = dict()
+        self.piece_teams = dict()
+        self.team_pieces = dict()
 
     def get_node_tile(self, position) -> Tile:
         return self.nodes[position].tile
@@ -191,6 +296,8 @@ class GraphBoard:
             tint = self.nodes[position].tile.tint
         tile.tint = tint
         self.nodes[position].tile = tile
+        self._unindex_piece(position)
+        self._index_piece(position, tile.piece)
         if tile != None and tile.piece != None and tile.piece.is_royal:
             for team in tile.piece.get_team_names():
                 if team not in self.royal_tiles:
@@ -214,12 +321,19 @@ class GraphBoard:
 
     def set_node_piece(self, position, piece):
         self.nodes[position].tile.piece = piece
+        self._unindex_piece(position)
+        self._index_piece(position, piece)
         if piece != None and piece.is_royal:
-            for team in piece.get_team_names():
+            teams = piece.get_team_names()
+            for team in teams:
                 if team not in self.royal_tiles:
                     self.royal_tiles[team] = []
                 if position not in self.royal_tiles[team]:
                     self.royal_tiles[team].append(position)
+            # A royal capturing another team's royal takes its tile over
+            for team, royal_tiles in self.royal_tiles.items():
+                if team not in teams and position in royal_tiles:
+                    royal_tiles.remove(position)
         else:
             for team in self.royal_tiles.keys():
                 try:
@@ -234,11 +348,10 @@ class GraphBoard:
         return []
 
     def get_team_pieces(self, team):
-        positions = []
-        for position in self.nodes.keys():
-            if team in self.get_piece_teams(position):
-                positions.append(position)
-        return positions
+        return list(self.team_pieces.get(team, []))
+
+    def has_team_pieces(self, team):
+        return bool(self.team_pieces.get(team))
     
     def get_node_type(self, position):
         if self.nodes[position].tile == None:
@@ -442,6 +555,125 @@ class GraphPresets:
 
         return board
     
+    def from_compact(state) -> GraphBoard:
+        adjacency_types, directions, current_team_index, tiles, adjacencies = state
+        board = GraphBoard(adjacency_types, directions, current_team_index)
+        for position, type, texture, disallowed_pieces, not_selectable, piece in tiles:
+            piece = Piece(*piece) if piece != None else None
+            board.add_node(position, Tile(piece, type, texture=texture, disallowed_pieces=disallowed_pieces, not_selectable=not_selectable))
+        for position1, position2, adjacency_type, direction, change_direction_to in adjacencies:
+            board.add_adjacency(position1, position2, adjacency_type, direction, change_direction_to)
+        return board
+
+    def wrapped_board(team1='white', team2='black') -> GraphBoard:
+        board = GraphPresets.empty_rectangular_grid(18, 4, tint1=(0.9, 0.9, 0.9), tint2=(0.7, 0.7, 0.7))
+
+        for i in range(4):
+            board.add_adjacency((17, i), (10-i, 0), 'edge', 'n', 'l')
+            board.add_adjacency((10-i, 0), (17, i), 'edge', 'e', 'r')
+
+            board.add_adjacency((0, i), (10-i, 3), 'edge', 's', 'l')
+            board.add_adjacency((10-i, 3), (0, i), 'edge', 'w', 'r')
+
+        for i in range(3):
+            board.add_adjacency((10-i, 3), (0, i+1), 'vertex', 'sw', 'r')
+            board.add_adjacency((0, i+1), (10-i, 3), 'vertex', 'se', 'l')
+            board.add_adjacency((9-i, 3), (0, i), 'vertex', 'nw', 'r')
+            board.add_adjacency((0, i), (9-i, 3), 'vertex', 'sw', 'l')
+
+            board.add_adjacency((10-i, 0), (17, i+1), 'vertex', 'se', 'r')
+            board.add_adjacency((17, i+1), (10-i, 0), 'vertex', 'ne', 'l')
+            board.add_adjacency((9-i, 0), (17, i), 'vertex', 'ne', 'r')
+            board.add_adjacency((17, i), (9-i, 0), 'vertex', 'nw', 'l')
+
+        board.add_adjacency((6, 3), (0, 3), 'vertex', 'nw', 'r')
+        board.add_adjacency((0, 3), (6, 3), 'vertex', 'se', 'l')
+        board.add_adjacency((11, 0), (17, 0), 'vertex', 'se', 'r')
+        board.add_adjacency((17, 0), (11, 0), 'vertex', 'ne', 'l')
+
+
+        def lower_loop(X):
+            poly = (-math.cos(3/2 * math.pi * (5-X[0])/5), math.sin(3/2 * math.pi * (5-X[0])/5))
+            poly = bbu.scalet(poly, 5-X[1])
+
+            return (poly[0]+4.5, poly[1]-5.5, X[2])
+
+        def upper_loop(X):
+            poly = (math.cos(3/2 * math.pi * X[0]/5), -math.sin(3/2 * math.pi * X[0]/5))
+            poly = bbu.scalet(poly, X[1]+1)
+
+            return (poly[0]-1.5, poly[1]-11.5, X[2])
+
+        def rot(X):
+            s = math.sqrt(2)/2
+            return (X[0]*s - X[1]*s, X[0]*s + X[1]*s, X[2])
+
+        for i in range(5):
+            for j in range(4):
+                render_polygon = (
+                    (i, j, 0),
+                    (i+1/3, j, 0),
+                    (i+2/3, j, 0),
+                    (i+1, j,0),
+                    (i+1, j+1, 0),
+                    (i+2/3, j+1, 0),
+                    (i+1/3, j+1, 0),
+                    (i, j+1, 0)
+                )
+
+                lower_polygon = tuple(lower_loop(vertex) for vertex in render_polygon)
+                board.set_node_rendering((i+1, j), lower_polygon)
+
+                upper_polygon = tuple(upper_loop(vertex) for vertex in render_polygon)
+                board.set_node_rendering((i+12, j), upper_polygon)
+
+        for i in range(4):
+            render_polygon = (
+                (3.5, -6.5-i, 0),
+                (3.5, -7.5-i, 0),
+                (4.5, -7.5-i, 0),
+                (4.5, -6.5-i, 0)
+            )
+            board.set_node_rendering((0, 3-i), render_polygon)
+            render_polygon = (
+                (-1.5, -10.5+i, 0),
+                (-0.5, -10.5+i, 0),
+                (-0.5, -9.5+i, 0),
+                (-1.5, -9.5+i, 0)
+            )
+            board.set_node_rendering((17, i), render_polygon)
+
+        for position in board.nodes.keys():
+            render_polygon = board.get_node(position).render_polygon
+            rot_poly = tuple(rot(vertex) for vertex in render_polygon)
+            shift_poly = tuple(bbu.sumt(vertex, (0, 15, 0)) for vertex in rot_poly)
+            board.set_node_rendering(position, shift_poly)
+
+
+        for i in range(4):
+            board.set_node_piece((2, i), Piece('pawn', team1, 's'))
+            board.set_node_piece((5, i), Piece('pawn', team1))
+
+            board.set_node_piece((12, i), Piece('pawn', team2, 's'))
+            board.set_node_piece((15, i), Piece('pawn', team2))
+
+        board.set_node_piece((4, 0), Piece('queen', team1))
+        board.set_node_piece((3, 0), Piece('king', team1, is_royal=True))
+
+        board.set_node_piece((14, 3), Piece('queen', team2))
+        board.set_node_piece((13, 3), Piece('king', team2, is_royal=True))
+
+        for i in range(2):
+            board.set_node_piece((3+i, 1), Piece('bishop', team1))
+            board.set_node_piece((3+i, 2), Piece('knight', team1))
+            board.set_node_piece((3+i, 3), Piece('rook', team1))
+
+            board.set_node_piece((13+i, 2), Piece('bishop', team2))
+            board.set_node_piece((13+i, 1), Piece('knight', team2))
+            board.set_node_piece((13+i, 0), Piece('rook', team2))
+
+        return board
+
     def empty_hexagonal_grid(i, j, k, tint1=(0.9, 0.9, 0.9), tint2=(0.8, 0.8, 0.8), tint3=(0.7, 0.7, 0.7)) -> GraphBoard:
         board = GraphBoard(directions=dp.hexagonal_2d())
         dq = (0 , -1, 1 )
@@ -0,0 +1,34 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+from hashlib import blake2b
+
+# Keys are derived from a digest of their parts instead of a seeded random table so that
+# any board position can be keyed lazily and the same position hashes identically in every process
+_keys = dict()
+
+def zobrist_key(*parts) -> int:
+    key = _keys.get(parts)
+    if key == None:
+        key = int.from_bytes(blake2b(repr(parts).encode(), digest_size=8).digest(), 'little')
+        _keys[parts] = key
+    return key
+
+def piece_key(position, piece) -> int:
+    return zobrist_key(position, piece.name, tuple(sorted(piece.get_team_names())), piece.facing, piece.has_moved)
+
+def turn_key(current_team_index) -> int:
+    return zobrist_key('current_team_index', current_team_index)
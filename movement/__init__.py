@@ -1,3 +1,3 @@
 from .move import Move
-from .moveset import Moveset, MovesetPresets
+from .moveset import Moveset, MovesetPresets, compile_condition
 from .rule_set import RuleSet, RulePresets
\ No newline at end of file
@@ -17,6 +17,20 @@ limitations under the License.
 from movement import Move
 from typing import Optional, List, Tuple, Any
 
+# Condition strings are shared between many movesets, so each one is only compiled once
+_compiled_conditions = dict()
+
+def compile_condition(condition: str):
+    if condition not in _compiled_conditions:
+        try:
+            predicate = eval(condition)
+        except Exception as error:
+            raise ValueError(f'Invalid moveset condition {condition!r}: {error}') from error
+        if not callable(predicate):
+            raise ValueError(f'Moveset condition {condition!r} does not evaluate to a callable')
+        _compiled_conditions[condition] = predicate
+    return _compiled_conditions[condition]
+
 class Moveset:
     def __init__(self, moves: List[Move], move_distance: int = -1, can_move_empty: bool = True, can_capture: bool = True, condition_requirement: str = 'lambda board, position, team, teams: True', condition_override: Optional[List[Tuple[str, 'Moveset']]] = None):
         self.moves = moves
@@ -25,24 +39,41 @@ class Moveset:
         self.can_capture = can_capture
         self.condition_requirement = condition_requirement
         self.condition_override = condition_override
+        self.compile_conditions()
 
-    def get_moves(self, board, tile, team, teams):
+    def __getstate__(self):
+        # Only the condition strings are serialized, the compiled predicates are rebuilt on load
+        state = self.__dict__.copy()
+        state.pop('requirement_predicate', None)
+        state.pop('override_predicates', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.compile_conditions()
+
+    def compile_conditions(self):
+        self.requirement_predicate = compile_condition(self.condition_requirement)
+        self.override_predicates = []
         if self.condition_override != None:
             for condition_str, moveset in self.condition_override:
-                condition = eval(condition_str)
-                if condition(board, tile, team, teams):
-                    return moveset.moves, moveset.move_distance, moveset.can_move_empty, moveset.can_capture
+                self.override_predicates.append((compile_condition(condition_str), moveset))
+
+    def get_moves(self, board, tile, team, teams):
+        for condition, moveset in self.override_predicates:
+            if condition(board, tile, team, teams):
+                return moveset.moves, moveset.move_distance, moveset.can_move_empty, moveset.can_capture
         return self.moves, self.move_distance, self.can_move_empty, self.can_capture
     
     def add_condition(self, condition: str, moveset: 'Moveset'):
         if self.condition_override == None:
             self.condition_override = []
         self.condition_override.append((condition, moveset))
+        self.override_predicates.append((compile_condition(condition), moveset))
         return self
     
     def meets_requirements(self, board, position, team, teams):
-        condition = eval(self.condition_requirement)
-        return condition(board, position, team, teams)
+        return self.requirement_predicate(board, position, team, teams)
     
 
 class MovesetPresets:
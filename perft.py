@@ -0,0 +1,99 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import argparse
+import time
+from graph_board import GraphBoard
+from rule_engines import GraphRuleEngine
+from game_presets import GamePresets
+
+
+class Perft:
+    def __init__(self, rule_engine: GraphRuleEngine, board: GraphBoard, check=False):
+        self.rule_engine = rule_engine
+        self.board = board
+        self.check = check
+        self.royal_numbers = rule_engine.get_royal_numbers(board)
+
+    def teams_remaining(self):
+        return len([team for team in self.rule_engine.turn_order if not self.rule_engine.has_lost(self.board, team, self.royal_numbers)])
+
+    def count(self, depth):
+        if depth == 0:
+            return 1
+
+        board = self.board
+        rule_engine = self.rule_engine
+        team = rule_engine.turn_order[board.current_team_index]
+
+        if rule_engine.has_lost(board, team, self.royal_numbers):
+            if self.teams_remaining() < 2:
+                return 0
+            # Teams that have lost pass their turn instead of being removed from turn_order
+            current_team_index = board.current_team_index
+            board.current_team_index = (current_team_index + 1) % len(rule_engine.turn_order)
+            nodes = self.count(depth)
+            board.current_team_index = current_team_index
+            return nodes
+
+        moves = rule_engine.get_all_legal_moves_with_facing(team, board, self.check)
+        if depth == 1:
+            return len(moves)
+
+        nodes = 0
+        for start_pos, end_pos, new_facing in moves:
+            undo = rule_engine.make_move(board, start_pos, end_pos, new_facing)
+            nodes += self.count(depth - 1)
+            rule_engine.unmake_move(board, undo)
+        return nodes
+
+    def divide(self, depth):
+        divided = dict()
+        if depth < 1:
+            return divided
+
+        board = self.board
+        rule_engine = self.rule_engine
+        team = rule_engine.turn_order[board.current_team_index]
+        for start_pos, end_pos, new_facing in rule_engine.get_all_legal_moves_with_facing(team, board, self.check):
+            undo = rule_engine.make_move(board, start_pos, end_pos, new_facing)
+            divided[(start_pos, end_pos, new_facing)] = self.count(depth - 1)
+            rule_engine.unmake_move(board, undo)
+        return divided
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Count the positions reachable from a board to check and time move generation')
+    parser.add_argument('board', help="a preset (standard, corner, glinski, wrapped), a saved preset such as 'hex/glinski' or a .ucbgame file")
+    parser.add_argument('depth', type=int)
+    parser.add_argument('--divide', action='store_true', help='print the node count below each root move')
+    parser.add_argument('--check', action='store_true', help='pass check=True to move generation')
+    args = parser.parse_args()
+
+    board, rule_engine = GamePresets.load(args.board)
+    perft = Perft(rule_engine, board, args.check)
+
+    for depth in range(1, args.depth + 1):
+        start_time = time.perf_counter()
+        if args.divide and depth == args.depth:
+            divided = perft.divide(depth)
+            for (start_pos, end_pos, new_facing), nodes in divided.items():
+                print(f'{start_pos} -> {end_pos} ({new_facing}): {nodes}')
+            nodes = sum(divided.values())
+        else:
+            nodes = perft.count(depth)
+        elapsed = time.perf_counter() - start_time
+        print(f'depth {depth}: {nodes} nodes in {elapsed:.3f}s ({nodes / max(elapsed, 1e-9):.0f} nodes/s)')
@@ -42,6 +42,13 @@ class Piece:
         else:
             self.is_royal = is_royal
 
+    def copy(self):
+        return Piece(self.name, self.team, self.facing, self.is_royal, self.has_moved, self.secondary_team, self.trinary_team, self.quadinary_team)
+
+    def to_compact(self):
+        # In constructor order, so Piece(*state) rebuilds the piece
+        return (self.name, self.team, self.facing, self.is_royal, self.has_moved, self.secondary_team, self.trinary_team, self.quadinary_team)
+
     def moved(self):
         self.has_moved = True
         return self
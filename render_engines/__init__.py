@@ -1,2 +1,3 @@
 from .abstract_render_engine import AbstractRenderEngine
+from .ai_worker import AIWorker
 from .graph_render_engine import GraphRenderEngine
\ No newline at end of file
@@ -0,0 +1,137 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import multiprocessing
+from graph_board import GraphBoard
+from graph_board.graph_board import GraphPresets
+from rule_engines import GraphRuleEngine
+from search_engines import SearchTimeout
+
+
+def _worker_main(connection, compact_board, rule_engine, stop_event):
+    # The worker keeps one board and rule engine, so search engines keep what they learn between moves
+    board = GraphPresets.from_compact(compact_board)
+    rule_engine.stop_event = stop_event
+    while True:
+        task = connection.recv()
+        if task == None:
+            break
+        key, piece_state, turn_order, ai_type, check = task
+        board.set_piece_state(piece_state)
+        rule_engine.turn_order = list(turn_order)
+        rule_engine.last_search_result = None
+        try:
+            new_board = rule_engine.ai_play(board, ai_type, check)
+        except SearchTimeout:
+            connection.send((key, True, None, None))
+            continue
+        move = rule_engine.last_ai_move if new_board is not board else None
+        connection.send((key, False, move, rule_engine.last_search_result))
+
+
+class AIWorker:
+    # Runs ai_play in another process so the render loop keeps drawing while the AI thinks. Results are kept by
+    # position, so a search started while pondering is used as soon as the predicted position is reached
+    def __init__(self, rule_engine: GraphRuleEngine, check=False):
+        self.rule_engine = rule_engine
+        self.check = check
+        self.process = None
+        self.connection = None
+        self.stop_event = None
+        # Key of the search running in the worker, and whether it is a ponder
+        self.task_key = None
+        self.pondering = False
+        # Whether a stopped search has yet to answer, until which the stop_event stays set and nothing new is sent
+        self.stopping = False
+        # The last finished search, as (move, search result)
+        self.result_key = None
+        self.result = None
+
+    def get_key(self, board: GraphBoard, ai_type):
+        return (board.zobrist_hash, tuple(self.rule_engine.turn_order), ai_type)
+
+    def send(self, board: GraphBoard, ai_type, key):
+        if self.process == None:
+            self.connection, child_connection = multiprocessing.Pipe()
+            self.stop_event = multiprocessing.Event()
+            # Not a daemon, so ai_types that start their own process pools (parallel_N, mcts_N) still can
+            self.process = multiprocessing.Process(target=_worker_main, args=(child_connection, board.to_compact(), self.rule_engine, self.stop_event))
+            self.process.start()
+        self.connection.send((key, board.get_piece_state(), list(self.rule_engine.turn_order), ai_type, self.check))
+        self.task_key = key
+
+    def poll(self):
+        if (self.task_key != None or self.stopping) and self.connection.poll():
+            key, stopped, move, search_result = self.connection.recv()
+            if self.stopping:
+                self.stop_event.clear()
+                self.stopping = False
+            if not stopped:
+                self.result_key = key
+                self.result = (move, search_result)
+            self.task_key = None
+            self.pondering = False
+
+    def think(self, board: GraphBoard, ai_type):
+        # Returns (move, search result) once ai_type has searched board, None while it is still thinking
+        key = self.get_key(board, ai_type)
+        self.poll()
+        if key == self.result_key:
+            return self.result
+        if self.task_key != key:
+            # A ponder on a position that was not reached, or a search the board has moved on from
+            if self.task_key != None:
+                self.cancel()
+            if not self.stopping:
+                self.send(board, ai_type, key)
+        self.pondering = False
+        return None
+
+    def ponder(self, board: GraphBoard, ai_type):
+        # Searches a predicted position while the worker would otherwise be idle
+        self.poll()
+        key = self.get_key(board, ai_type)
+        if self.task_key == None and not self.stopping and key != self.result_key:
+            self.send(board, ai_type, key)
+            self.pondering = True
+
+    def is_thinking(self):
+        return self.task_key != None and not self.pondering
+
+    def cancel(self):
+        # Stops the running search through the stop_event, keeping the worker and everything its search engines learnt.
+        # The search answers within a few nodes, and the next one is sent once it has
+        if self.task_key != None:
+            self.stop_event.set()
+            self.stopping = True
+        self.task_key = None
+        self.pondering = False
+
+    def close(self):
+        if self.process != None:
+            # A running search is stopped first, so the worker reads the None and exits
+            self.stop_event.set()
+            self.connection.send(None)
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+            self.connection.close()
+        self.process = None
+        self.connection = None
+        self.task_key = None
+        self.pondering = False
+        self.stopping = False
@@ -19,6 +19,7 @@ import math
 from graph_board import GraphBoard, GraphPresets as gp
 from rule_engines import GraphRuleEngine
 from render_engines import AbstractRenderEngine
+from render_engines.ai_worker import AIWorker
 import pygame
 from PIL import Image
 from pygame.locals import *
@@ -42,6 +43,12 @@ class GraphRenderEngine(AbstractRenderEngine):
         self.illegal_moves = illegal_moves
 
         self.imgs = dict()
+
+    def __getstate__(self):
+        # The AI worker holds a process and a pipe, it is started again by initialize
+        state = self.__dict__.copy()
+        state.pop('ai_worker', None)
+        return state
     
     def copy(self):
         copy_engine = GraphRenderEngine(board=self.board.copy(), rule_engine=self.rule_engine.copy(), illegal_moves=self.illegal_moves)
@@ -67,6 +74,10 @@ class GraphRenderEngine(AbstractRenderEngine):
         else:
             current_team = None
         board_color = self.get_board_color(current_team)
+        if self.thinking:
+            # The team's border pulses while its AI is thinking
+            pulse = 0.75 + 0.25 * math.sin(pygame.time.get_ticks() / 150)
+            board_color = tuple(channel * pulse for channel in board_color)
 
         square_size = 1 / 10
         border_widths = [1.05, 1.04, 1.01]  # Outer, Team, and Inner border widths
@@ -313,7 +324,26 @@ class GraphRenderEngine(AbstractRenderEngine):
         
         self.store_imgs()
 
-        return self.main_loop()
+        self.ai_worker = AIWorker(self.rule_engine)
+        self.thinking = False
+        try:
+            return self.main_loop()
+        finally:
+            self.ai_worker.close()
+
+    def ponder(self, search_result):
+        # While a human moves, search the position after the reply the AI expects, so that search is ready if they play it
+        if search_result == None or len(search_result.pv) < 2 or not self.rule_engine.turn_order:
+            return
+        current_team = self.rule_engine.turn_order[self.board.current_team_index]
+        start_pos, end_pos = search_result.pv[1][:2]
+        piece = self.board.get_node_piece(start_pos)
+        if current_team in self.ai_teams or piece == None or current_team not in piece.get_team_names():
+            return
+        predicted_board = self.rule_engine.play_move(self.board, start_pos, end_pos, check=False)
+        next_team = self.rule_engine.turn_order[predicted_board.current_team_index]
+        if predicted_board is not self.board and next_team in self.ai_teams:
+            self.ai_worker.ponder(predicted_board, self.ai_teams[next_team])
 
     def main_loop(self):
 
@@ -392,9 +422,9 @@ class GraphRenderEngine(AbstractRenderEngine):
             self.camera_pos = [rcamera[0]*cos + rcamera[1]*sin, -rcamera[0]*sin + rcamera[1]*cos, rcamera[2]]
 
             if selected_tile != '':
-                highlight_tiles = [move[0] for move in self.rule_engine.get_legal_moves(selected_tile, self.board)]
+                highlight_tiles = [move[0] for move in self.rule_engine.iter_legal_moves(selected_tile, self.board)]
             elif hover_tile != '':
-                highlight_tiles = [move[0] for move in self.rule_engine.get_legal_moves(hover_tile, self.board)]
+                highlight_tiles = [move[0] for move in self.rule_engine.iter_legal_moves(hover_tile, self.board)]
             else: 
                 highlight_tiles = []
 
@@ -420,17 +450,7 @@ class GraphRenderEngine(AbstractRenderEngine):
                 current_team = None
 
             if self.rule_engine.turn_order:
-                lose_condition = self.rule_engine.lose[current_team]
-                royal_tiles_count = len(self.board.royal_tiles[current_team])
-
-                if lose_condition == 'eliminate_royals' and not royal_tiles_count:
-                    msg = f"all of {current_team}'s royal pieces were eliminated"
-                elif lose_condition == 'eliminate_any_royal' and royal_tiles_count < self.team_royal_numbers[current_team]:
-                    msg = f"one of {current_team}'s royal pieces was eliminated"
-                elif not self.board.get_team_pieces(current_team):
-                    msg = f"all of {current_team}'s pieces were eliminated"
-                else:
-                    msg = None
+                msg = self.rule_engine.has_lost(self.board, current_team, self.team_royal_numbers)
 
                 if msg != None:
                     self.rule_engine.turn_order.remove(current_team)
@@ -438,11 +458,22 @@ class GraphRenderEngine(AbstractRenderEngine):
                     if self.rule_engine.turn_order:
                         self.board.current_team_index %= len(self.rule_engine.turn_order)
 
-            if current_team in self.ai_teams and frame % self.ai_turn_delay == 0 and len(self.rule_engine.turn_order) > 1:
-                if self.board.current_team_index == len(self.rule_engine.turn_order) - 1:
-                    turn += 1
-                self.board = self.rule_engine.ai_play(self.board, self.ai_teams[current_team], False)
-                saved = False
+            thinking = False
+            if current_team in self.ai_teams and len(self.rule_engine.turn_order) > 1:
+                # The AI searches in its worker process while this loop keeps drawing, and its move is played once it is ready
+                result = self.ai_worker.think(self.board, self.ai_teams[current_team])
+                thinking = result == None
+                if result != None and result[0] != None and frame % self.ai_turn_delay == 0:
+                    move, search_result = result
+                    self.rule_engine.last_search_result = search_result
+                    if self.board.current_team_index == len(self.rule_engine.turn_order) - 1:
+                        turn += 1
+                    self.board = self.rule_engine.play_move(self.board, *move, check=False)
+                    saved = False
+                    self.ponder(search_result)
+            if thinking != self.thinking:
+                self.thinking = thinking
+                pygame.display.set_caption(f'{current_team} is thinking...' if thinking else 'The Ultimate Chess Builder')
 
             mvMat = glGetDoublev(GL_MODELVIEW_MATRIX)
             prjMat = glGetDoublev(GL_PROJECTION_MATRIX)
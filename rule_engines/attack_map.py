@@ -0,0 +1,120 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+from typing import TYPE_CHECKING
+from graph_board import GraphBoard
+
+if TYPE_CHECKING:
+    from rule_engines import GraphRuleEngine
+    from rule_engines.graph_rule_engine import MoveUndo
+
+
+class AttackMap:
+    # Which tiles each piece attacks and how many times each team attacks a tile, kept up to date by make_move and
+    # unmake_move while the map matches the board. A ray always ends on the first piece it reaches, so a move only
+    # changes the attacks of the pieces on its two tiles and of the pieces that attacked either of them. Moveset
+    # conditions are evaluated when a piece's attacks are computed, so conditions that look at other tiles can go stale
+    def __init__(self, rule_engine: 'GraphRuleEngine'):
+        self.rule_engine = rule_engine
+        # The board's piece_hash and topology the map was built for
+        self.key = None
+        self.topology = None
+        # position -> (team names, attacked positions) of the piece standing there
+        self.entries = dict()
+        # position -> positions of the pieces attacking it
+        self.attackers = dict()
+        # team -> position -> number of attacks
+        self.counts = dict()
+        self.history = []
+
+    def is_valid(self, board: GraphBoard):
+        return self.key == board.piece_hash and self.topology is board.compiled_topology
+
+    def reset(self, board: GraphBoard):
+        self.key = board.piece_hash
+        self.topology = board.compile()
+        self.entries = dict()
+        self.attackers = dict()
+        self.counts = dict()
+        self.history = []
+        for position in list(board.piece_keys.keys()):
+            self.add(board, position)
+
+    def insert(self, position, entry):
+        self.entries[position] = entry
+        teams, attacked = entry
+        for target in attacked:
+            if target not in self.attackers:
+                self.attackers[target] = set()
+            self.attackers[target].add(position)
+            for team in teams:
+                if team not in self.counts:
+                    self.counts[team] = dict()
+                team_counts = self.counts[team]
+                team_counts[target] = team_counts.get(target, 0) + 1
+
+    def add(self, board: GraphBoard, position):
+        piece = board.get_node_piece(position)
+        if piece != None:
+            self.insert(position, (piece.get_team_names(), tuple(self.rule_engine.iter_attacks(position, board))))
+
+    def remove(self, position):
+        entry = self.entries.pop(position, None)
+        if entry == None:
+            return None
+        teams, attacked = entry
+        for target in attacked:
+            self.attackers[target].discard(position)
+            for team in teams:
+                team_counts = self.counts[team]
+                team_counts[target] -= 1
+                if not team_counts[target]:
+                    del team_counts[target]
+        return entry
+
+    def push(self, board: GraphBoard, undo: 'MoveUndo'):
+        # Called after make_move, while the attackers still describe the position before it
+        changed = {undo.start_pos, undo.end_pos}
+        changed |= self.attackers.get(undo.start_pos, set())
+        changed |= self.attackers.get(undo.end_pos, set())
+        old_entries = [(position, self.remove(position)) for position in changed]
+        for position in changed:
+            self.add(board, position)
+        self.history.append((undo, old_entries, self.key))
+        self.key = board.piece_hash
+
+    def pop(self):
+        _, old_entries, self.key = self.history.pop()
+        for position, _ in old_entries:
+            self.remove(position)
+        for position, entry in old_entries:
+            if entry != None:
+                self.insert(position, entry)
+
+    def get_attack_count(self, team, position):
+        return self.counts.get(team, dict()).get(position, 0)
+
+    def get_team_attacks(self, team):
+        return dict(self.counts.get(team, dict()))
+
+    def is_attacked(self, board: GraphBoard, position, piece=None):
+        # Whether any piece attacking position could capture piece there, by default the piece standing on it
+        if piece == None:
+            piece = board.get_node_piece(position)
+        for origin in self.attackers.get(position, ()):
+            if piece == None or self.rule_engine.can_capture_piece(board.get_node_piece(origin), piece):
+                return True
+        return False
@@ -16,15 +16,38 @@ limitations under the License.
 
 import random
 from graph_board import GraphBoard
+from rule_engines.attack_map import AttackMap
 from movement import RuleSet, RulePresets as rp
 from typing import List, Dict, Any
 from teams import Team, TeamPresets as tp
 import copy
 
+# Searches shallower than these are quick to repeat, so they are not worth a place in the opening book
+BOOK_MIN_DEPTH = 3
+BOOK_MIN_PLAYOUTS = 1000
+
+
+class MoveUndo:
+    def __init__(self, start_pos, end_pos, piece, captured, name, facing, has_moved, current_team_index, royal_tiles=None):
+        self.start_pos = start_pos
+        self.end_pos = end_pos
+        self.piece = piece
+        self.captured = captured
+        self.name = name
+        self.facing = facing
+        self.has_moved = has_moved
+        self.current_team_index = current_team_index
+        self.royal_tiles = royal_tiles
+
+    def __str__(self) -> str:
+        return f'MoveUndo({self.start_pos} -> {self.end_pos})'
+
+    def __repr__(self) -> str:
+        return self.__str__()
 
 class GraphRuleEngine:
-    def __init__(self, rulesets: Dict[str, RuleSet] = None, teams: Dict[str, Team] = None, promotion_tiles: Dict[str, Any] = None, turn_order: List[str] = None, multiteam_capture_ally = False, lose = None):
-        self.rulesets = rp.STANDARD
+    def __init__(self, rulesets: Dict[str, RuleSet] = None, teams: Dict[str, Team] = None, promotion_tiles: Dict[str, Any] = None, turn_order: List[str] = None, multiteam_capture_ally = False, lose = None, branching_moves = False):
+        self.rulesets = dict(rp.STANDARD)
         if rulesets != None:
             self.rulesets.update(rulesets)
 
@@ -52,41 +75,87 @@ class GraphRuleEngine:
             self.lose = lose
 
         self.multiteam_capture_ally = multiteam_capture_ally
+        # Follow every adjacency a move step can take from a tile instead of only the first one
+        self.branching_moves = branching_moves
+        self.search_engines = dict()
+        self.last_search_result = None
+        self.last_ai_move = None
+        # Position book file ai_play looks searches up in and records them to, None for no book
+        self.book_path = None
+        self.opening_book = None
+        # Directory of endgame tables searches look leaf positions up in, None for no tables
+        self.tablebase_dir = None
+        self.tablebases = None
+        # Event another process sets to stop the search ai_play is running, which then raises SearchTimeout
+        self.stop_event = None
+
+    def __getstate__(self):
+        # Search engines hold per-game caches that are rebuilt on demand, keep them out of saved games
+        state = self.__dict__.copy()
+        state['search_engines'] = dict()
+        state['last_search_result'] = None
+        state['last_ai_move'] = None
+        state['opening_book'] = None
+        state['tablebases'] = None
+        state['stop_event'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if 'search_engines' not in state:
+            self.search_engines = dict()
+            self.last_search_result = None
+        if 'branching_moves' not in state:
+            self.branching_moves = False
+        if 'last_ai_move' not in state:
+            self.last_ai_move = None
+        if 'book_path' not in state:
+            self.book_path = None
+            self.opening_book = None
+        if 'tablebase_dir' not in state:
+            self.tablebase_dir = None
+            self.tablebases = None
+        if 'stop_event' not in state:
+            self.stop_event = None
 
     def copy(self):
-        return GraphRuleEngine(self.rulesets, self.teams, self.promotion_tiles, copy.copy(self.turn_order), self.multiteam_capture_ally)
+        rule_engine = GraphRuleEngine(self.rulesets, self.teams, self.promotion_tiles, copy.copy(self.turn_order), self.multiteam_capture_ally, branching_moves=self.branching_moves)
+        rule_engine.book_path = self.book_path
+        rule_engine.tablebase_dir = self.tablebase_dir
+        return rule_engine
     
     def add_ruleset(self, position, board: GraphBoard, ruleset: RuleSet):
+        return list(self.iter_ruleset(position, board, ruleset))
+
+    def iter_ruleset(self, position, board: GraphBoard, ruleset: RuleSet):
+        # Yields each (end position, facing) once, as soon as it is found
         tile = board.get_node_tile(position)
         if tile == None or tile.piece == None:
-            return []
+            return
         piece = tile.piece
-
-        team = self.teams[piece.team]
-        if piece.has_moved and self.multiteam_capture_ally:
-            allies = piece.get_allies_intersection(self.teams)
-            multiteam_capture_ally = True
-        else:
-            allies = piece.get_allies_union(self.teams)
-            multiteam_capture_ally = False
+        allies, inclusive = self.get_capture_allies(piece)
 
         piece_name = ruleset.name
-        legal_moves = []
+        # (position, facing, last movement) of every move found so far, and their positions
+        reached = set()
+        reached_positions = set()
+
+        topology = board.compile()
+        start_node = topology.position_ids[position]
+        start_facing = topology.direction_codes.get(piece.facing, -1)
 
         if piece.name == piece_name:
             for moveset in ruleset.movesets:
                 if moveset.meets_requirements(board, position, piece.get_team_names(), self.teams):
                     moves, move_distance, can_move_empty, can_capture = moveset.get_moves(board, position, piece.get_team_names(), self.teams)
 
-                    for move in moves:
-                        new_position = position
-                        new_facing = piece.facing
-                        i = 0
-                        while i in range(move_distance) or move_distance == -1:
-                            i += 1
-                            new_position, new_facing, last_movement = move.get_end_position(board, new_position, new_facing)
-                            if new_position == None:
-                                break
+                    for ray in topology.get_moveset_rays(moves, start_node, start_facing, self.branching_moves):
+                        if move_distance != -1:
+                            ray = ray[:move_distance]
+                        for node, facing, last_code in ray:
+                            new_position = topology.positions[node]
+                            new_facing = topology.directions[facing]
+                            last_movement = topology.directions[last_code]
                             target = board.get_node_tile(new_position)
                             if target == None:
                                 break
@@ -95,46 +164,177 @@ class GraphRuleEngine:
                             except:
                                 disallowed_pieces = []
 
-                            if (new_position, new_facing, last_movement) in legal_moves:
+                            if (new_position, new_facing, last_movement) in reached:
                                 break
-                            if new_position in [move[0] for move in legal_moves]:
+                            if new_position in reached_positions:
+                                # Rays that cross an earlier move's tile go on past it, unless a piece stands there
+                                if target.piece != None:
+                                    break
                                 continue
                             if piece.name in disallowed_pieces:
                                 break
                             if target.piece == None and can_move_empty:
-                                legal_moves.append((new_position, new_facing, last_movement))
+                                reached.add((new_position, new_facing, last_movement))
+                                reached_positions.add(new_position)
+                                yield new_position, new_facing
                             elif target.piece != None:
-                                if can_capture and not target.piece.is_allies(allies, not multiteam_capture_ally):
-                                    legal_moves.append((new_position, new_facing, last_movement))
+                                if can_capture and not target.piece.is_allies(allies, inclusive):
+                                    reached.add((new_position, new_facing, last_movement))
+                                    reached_positions.add(new_position)
+                                    yield new_position, new_facing
                                 break
-        
-        if legal_moves:
-            pure_legal_moves = list(set([tuple(move[:2]) for move in legal_moves if None not in move]))
-        else:
-            pure_legal_moves = []
 
-        return pure_legal_moves
-    
+    def get_capture_allies(self, piece):
+        # The allies a piece may not capture, and whether sharing any team with them is enough to be one
+        if piece.has_moved and self.multiteam_capture_ally:
+            return piece.get_allies_intersection(self.teams), False
+        return piece.get_allies_union(self.teams), True
+
+    def get_moved_independent_names(self):
+        # Pieces whose moves are the same whether they have moved or not: none with multiteam_capture_ally, which changes
+        # who moved pieces may capture, and otherwise those without a moveset condition reading has_moved
+        if self.multiteam_capture_ally:
+            return set()
+
+        def reads_has_moved(moveset):
+            overrides = moveset.condition_override or []
+            return 'has_moved' in moveset.condition_requirement or any(['has_moved' in condition or reads_has_moved(override) for condition, override in overrides])
+
+        return {name for name, ruleset in self.rulesets.items() if not any([reads_has_moved(moveset) for moveset in ruleset.movesets])}
+
+    def can_capture_piece(self, piece, target):
+        allies, inclusive = self.get_capture_allies(piece)
+        return not target.is_allies(allies, inclusive)
+
+    def iter_attacks(self, position, board: GraphBoard):
+        # Tiles the piece on position could capture on if an enemy stood there, each ray ending on the first piece it reaches.
+        # A tile is yielded once per ray attacking it
+        piece = board.get_node_piece(position)
+        ruleset = self.rulesets.get(piece.name) if piece != None else None
+        if ruleset == None:
+            return
+
+        topology = board.compile()
+        start_node = topology.position_ids[position]
+        start_facing = topology.direction_codes.get(piece.facing, -1)
+        for moveset in ruleset.movesets:
+            if moveset.meets_requirements(board, position, piece.get_team_names(), self.teams):
+                moves, move_distance, _, can_capture = moveset.get_moves(board, position, piece.get_team_names(), self.teams)
+                if not can_capture:
+                    continue
+
+                for ray in topology.get_moveset_rays(moves, start_node, start_facing, self.branching_moves):
+                    if move_distance != -1:
+                        ray = ray[:move_distance]
+                    for node, _, _ in ray:
+                        new_position = topology.positions[node]
+                        target = board.get_node_tile(new_position)
+                        if target == None:
+                            break
+                        try:
+                            disallowed_pieces = target.disallowed_pieces
+                        except:
+                            disallowed_pieces = []
+                        if piece.name in disallowed_pieces:
+                            break
+                        yield new_position
+                        if target.piece != None:
+                            break
+
+    def get_attack_map(self, board: GraphBoard) -> AttackMap:
+        attack_map = board.attack_map
+        if attack_map == None or attack_map.rule_engine is not self:
+            attack_map = AttackMap(self)
+            board.attack_map = attack_map
+        if not attack_map.is_valid(board):
+            attack_map.reset(board)
+        return attack_map
+
+    def get_guarded_royals(self, board: GraphBoard, team):
+        # Royal tiles team loses the game by losing, which its own moves may not leave attacked
+        royal_tiles = board.royal_tiles.get(team, [])
+        lose_condition = self.lose.get(team, 'eliminate_royals')
+        if lose_condition == 'eliminate_any_royal' or (lose_condition == 'eliminate_royals' and len(royal_tiles) == 1):
+            return list(royal_tiles)
+        return []
+
+    def is_in_check(self, board: GraphBoard, team):
+        attack_map = self.get_attack_map(board)
+        return any([attack_map.is_attacked(board, position) for position in self.get_guarded_royals(board, team)])
+
+    def iter_checked_moves(self, position, board: GraphBoard, moves):
+        piece = board.get_node_piece(position)
+        # A piece on several teams may not expose the guarded royals of any of them
+        teams = [team for team in piece.get_team_names() if team != None]
+        guarded_royals = [royal for team in teams for royal in self.get_guarded_royals(board, team)]
+        if not guarded_royals:
+            yield from moves
+            return
+
+        attack_map = self.get_attack_map(board)
+        # Rays end on the first piece they reach, so a move can only expose a royal when a ray that could capture it reaches the tile it leaves
+        if not piece.is_royal and not any([attack_map.is_attacked(board, royal) for royal in guarded_royals]):
+            royal_pieces = [board.get_node_piece(royal) for royal in guarded_royals]
+            if not any([attack_map.is_attacked(board, position, royal_piece) for royal_piece in royal_pieces]):
+                yield from moves
+                return
+
+        for end_pos, new_facing in moves:
+            undo = self.make_move(board, position, end_pos, new_facing)
+            attack_map = self.get_attack_map(board)
+            exposed = any([attack_map.is_attacked(board, royal) for team in teams for royal in self.get_guarded_royals(board, team)])
+            self.unmake_move(board, undo)
+            if not exposed:
+                yield end_pos, new_facing
+
     def get_legal_moves(self, position, board: GraphBoard, check=False):
-        tile = board.get_node_tile(position)
-        legal_moves = []
+        return list(self.iter_legal_moves(position, board, check))
 
+    def iter_legal_moves(self, position, board: GraphBoard, check=False):
+        # With check, moves that leave one of the team's guarded royals attacked are left out
+        tile = board.get_node_tile(position)
         if tile == None or tile.piece == None:
-            return legal_moves
-        
+            return
+
         name = tile.piece.name
         if name in self.rulesets.keys():
-            legal_moves.extend(self.add_ruleset(position, board, self.rulesets[name]))
+            if check:
+                # Checking a move plays it on the board, so the piece's moves are all generated first
+                yield from self.iter_checked_moves(position, board, list(self.iter_ruleset(position, board, self.rulesets[name])))
+            else:
+                yield from self.iter_ruleset(position, board, self.rulesets[name])
 
-        return legal_moves
-    
     def get_all_legal_moves(self, team, board: GraphBoard, check=False):
-        legal_moves = []
+        return [(start_pos, end_pos) for start_pos, end_pos, _ in self.iter_all_legal_moves(team, board, check)]
+
+    def get_all_legal_moves_with_facing(self, team, board: GraphBoard, check=False):
+        return list(self.iter_all_legal_moves(team, board, check))
+
+    def iter_all_legal_moves(self, team, board: GraphBoard, check=False):
+        # Yields (start position, end position, facing) lazily, so the board must not change until the caller is done with it
         for position in board.get_team_pieces(team):
-            legal_moves_pos = self.get_legal_moves(position, board, check)
-            for move in legal_moves_pos:
-                legal_moves.append((position, move[0]))
-        return legal_moves
+            for end_pos, new_facing in self.iter_legal_moves(position, board, check):
+                yield position, end_pos, new_facing
+
+    def has_legal_moves(self, team, board: GraphBoard, check=False):
+        for _ in self.iter_all_legal_moves(team, board, check):
+            return True
+        return False
+
+    def get_royal_numbers(self, board: GraphBoard):
+        return {team: len(board.royal_tiles.get(team, [])) for team in self.turn_order}
+
+    def has_lost(self, board: GraphBoard, team, royal_numbers=None):
+        lose_condition = self.lose.get(team, 'eliminate_royals')
+        royal_tiles_count = len(board.royal_tiles.get(team, []))
+
+        if lose_condition == 'eliminate_royals' and not royal_tiles_count:
+            return f"all of {team}'s royal pieces were eliminated"
+        elif lose_condition == 'eliminate_any_royal' and royal_numbers != None and royal_tiles_count < royal_numbers.get(team, 0):
+            return f"one of {team}'s royal pieces was eliminated"
+        elif not board.has_team_pieces(team):
+            return f"all of {team}'s pieces were eliminated"
+        return None
 
     def get_move_score(self, board: GraphBoard, start_pos, end_pos):
         scores = dict()
@@ -169,45 +369,150 @@ class GraphRuleEngine:
 
         return scores
 
+    def make_move(self, board: GraphBoard, start_pos, end_pos, new_facing=None) -> MoveUndo:
+        piece = board.get_node_piece(start_pos)
+        captured = board.get_node_piece(end_pos)
+
+        if piece.is_royal or (captured != None and captured.is_royal):
+            royal_tiles = {team: list(positions) for team, positions in board.royal_tiles.items()}
+        else:
+            royal_tiles = None
+
+        undo = MoveUndo(start_pos, end_pos, piece, captured, piece.name, piece.facing, piece.has_moved, board.current_team_index, royal_tiles)
+        attack_map = board.attack_map
+        if attack_map != None and not attack_map.is_valid(board):
+            attack_map = None
+
+        board.set_node_piece(start_pos, None)
+        piece.moved()
+        if new_facing != None:
+            piece.facing = new_facing
+
+        promotion = self.rulesets[piece.name].promotion
+        if promotion != None:
+            for team in piece.get_team_names():
+                if end_pos in self.promotion_tiles.get(team, []):
+                    piece.promote(promotion)
+                    break
+        board.set_node_piece(end_pos, piece)
+
+        board.current_team_index = (board.current_team_index + 1) % len(self.turn_order)
+
+        if attack_map != None:
+            attack_map.push(board, undo)
+        return undo
+
+    def unmake_move(self, board: GraphBoard, undo: MoveUndo):
+        attack_map = board.attack_map
+        if attack_map != None and attack_map.is_valid(board) and attack_map.history and attack_map.history[-1][0] is undo:
+            attack_map.pop()
+        piece = undo.piece
+        board.set_node_piece(undo.end_pos, undo.captured)
+
+        piece.name = undo.name
+        piece.facing = undo.facing
+        piece.has_moved = undo.has_moved
+        board.set_node_piece(undo.start_pos, piece)
+
+        if undo.royal_tiles != None:
+            board.royal_tiles = undo.royal_tiles
+        board.current_team_index = undo.current_team_index
+
     def play_move(self, board: GraphBoard, start_pos, end_pos, illegal_moves=False, check=True) -> GraphBoard:
         if board.get_node_piece(start_pos) == None:
             print("Illegal Move")
             return board
 
         if not illegal_moves:
-            legal_moves = self.get_legal_moves(start_pos, board, check)
-            if end_pos not in [move[0] for move in legal_moves]:
+            for legal_end_pos, new_facing in self.iter_legal_moves(start_pos, board, check):
+                if legal_end_pos == end_pos:
+                    break
+            else:
                 print("Illegal Move")
                 return board
-            new_facing = legal_moves[[move[0] for move in legal_moves].index(end_pos)][1]
         else:
             new_facing = None
         
         if self.turn_order[board.current_team_index] not in board.get_node_piece(start_pos).get_team_names():
             print("Not your turn")
             return board
-        
-        piece = board.get_node_piece(start_pos)
-        piece_name = piece.name
 
+        # Pieces are shared between board copies, so move a copy to leave the original board untouched
         new_board = board.copy()
-        new_board.set_node_piece(end_pos, piece.moved())
-        new_board.set_node_piece(start_pos, None)
-
-
-        promotion = self.rulesets[piece_name].promotion
-        if new_facing != None:
-            new_board.get_node_piece(end_pos).facing = new_facing
-
-        if promotion != None:
-            for team in piece.get_team_names():
-                if end_pos in self.promotion_tiles[team]:
-                    new_board.set_node_piece(end_pos, piece.promote(promotion))
-
-        new_board.current_team_index = (new_board.current_team_index + 1) % len(self.turn_order)
+        new_board.set_node_piece(start_pos, board.get_node_piece(start_pos).copy())
+        self.make_move(new_board, start_pos, end_pos, new_facing)
 
         return new_board
     
+    def get_search_engine(self, ai_type):
+        # Engines are kept per ai_type so anything they learn carries over between turns
+        from search_engines import AlphaBetaSearchEngine, ParanoidSearchEngine, MaxNSearchEngine, ParallelSearchEngine, MonteCarloSearchEngine
+
+        name = ai_type.split('-')[0]
+        if name not in self.search_engines:
+            mode = name.split('_')[1:]
+            if name == 'id':
+                self.search_engines[name] = AlphaBetaSearchEngine(self)
+            elif name.startswith('alphabeta'):
+                self.search_engines[name] = AlphaBetaSearchEngine(self, mode[0] if mode else 'material')
+            elif name == 'paranoid':
+                self.search_engines[name] = ParanoidSearchEngine(self)
+            elif name == 'maxn':
+                self.search_engines[name] = MaxNSearchEngine(self)
+            elif name.startswith('parallel'):
+                self.search_engines[name] = ParallelSearchEngine(self, int(mode[0]) if mode else None)
+            elif name.startswith('mcts'):
+                # Seeded from random so seeding it makes games reproducible
+                self.search_engines[name] = MonteCarloSearchEngine(self, workers=int(mode[0]) if mode else 0, seed=random.getrandbits(32))
+        return self.search_engines.get(name)
+
+    def get_opening_book(self):
+        from search_engines import OpeningBook
+
+        if self.book_path == None:
+            return None
+        if self.opening_book == None or self.opening_book.path != self.book_path:
+            self.opening_book = OpeningBook(self.book_path)
+        return self.opening_book
+
+    def get_tablebases(self):
+        from search_engines import Tablebases
+
+        if self.tablebase_dir == None:
+            return None
+        if self.tablebases == None or self.tablebases.directory != self.tablebase_dir:
+            self.tablebases = Tablebases(self.tablebase_dir)
+        return self.tablebases
+
+    def book_search(self, board: GraphBoard, ai_type, check, effort, search):
+        # Plays a move the book has from a search by the same engine with at least effort (depth, or playouts for
+        # mcts), otherwise runs search and records its move if the search went deep enough. Teams that were
+        # eliminated and check change which moves are best, so they are part of the engine the book keeps the move
+        # under. Time-budgeted searches pass effort=None and only replay moves found with the same budget
+        from search_engines import SearchResult
+
+        book = self.get_opening_book()
+        if book == None:
+            return search()
+        name = ai_type.split('-')[0]
+        engine = f"{name if effort != None else ai_type}:{','.join(self.turn_order)}:{int(check)}"
+        entry = book.probe(board.zobrist_hash, engine, effort if effort != None else 0)
+        if entry != None:
+            move, score, book_effort = entry
+            # Guards against hash collisions and book files shared between variants, so the move has to be one the
+            # team to move can legally play on this board
+            team = self.turn_order[board.current_team_index]
+            if move[0] in board.nodes and any((start_pos, end_pos) == tuple(move[:2]) for start_pos, end_pos, _ in self.iter_all_legal_moves(team, board, check)):
+                return SearchResult(move, score, [move], 0, book_effort, 0.0)
+        result = search()
+        if name.startswith('mcts'):
+            stored_effort, min_effort = result.nodes, BOOK_MIN_PLAYOUTS
+        else:
+            stored_effort, min_effort = result.depth, BOOK_MIN_DEPTH
+        if result.best_move != None and stored_effort >= min_effort:
+            book.store(board.zobrist_hash, engine, result.best_move, result.score, stored_effort)
+        return result
+
     def ai_play(self, board: GraphBoard, ai_type = 'random', check=False, return_move_score=False):
         start_board = board
         new_board = board
@@ -218,6 +523,34 @@ class GraphRuleEngine:
             if ai_legal_moves:
                 ai_start_pos, ai_end_pos = random.choice(ai_legal_moves)
                 new_board = self.play_move(board, ai_start_pos, ai_end_pos, check=check)
+        elif ai_type[:9] == 'alphabeta' or ai_type[:8] == 'paranoid' or ai_type[:4] == 'maxn' or ai_type[:8] == 'parallel':
+            depth = int(ai_type.split('-')[1])
+            search_engine = self.get_search_engine(ai_type)
+            search_engine.check = check
+            self.last_search_result = self.book_search(board, ai_type, check, depth, lambda: search_engine.search(board, depth))
+            if self.last_search_result.best_move != None:
+                ai_start_pos, ai_end_pos = self.last_search_result.best_move[:2]
+                new_board = self.play_move(board, ai_start_pos, ai_end_pos, check=check)
+        elif ai_type[:3] == 'id-':
+            time_ms = int(ai_type.split('-')[1])
+            search_engine = self.get_search_engine(ai_type)
+            search_engine.check = check
+            self.last_search_result = self.book_search(board, ai_type, check, None, lambda: search_engine.iterative_deepening(board, time_ms))
+            if self.last_search_result.best_move != None:
+                ai_start_pos, ai_end_pos = self.last_search_result.best_move[:2]
+                new_board = self.play_move(board, ai_start_pos, ai_end_pos, check=check)
+        elif ai_type[:4] == 'mcts':
+            # mcts-<playouts> or mcts-<milliseconds>ms, with mcts_<workers>-... running the playouts in worker processes
+            budget = ai_type.split('-')[1]
+            search_engine = self.get_search_engine(ai_type)
+            search_engine.check = check
+            if budget[-2:] == 'ms':
+                self.last_search_result = self.book_search(board, ai_type, check, None, lambda: search_engine.search(board, time_ms=int(budget[:-2])))
+            else:
+                self.last_search_result = self.book_search(board, ai_type, check, int(budget), lambda: search_engine.search(board, int(budget)))
+            if self.last_search_result.best_move != None:
+                ai_start_pos, ai_end_pos = self.last_search_result.best_move[:2]
+                new_board = self.play_move(board, ai_start_pos, ai_end_pos, check=check)
         elif ai_type[:6] == 'minmax':
             mode = ai_type.split('-')[0].split('_')[1:]
             if not len(mode):
@@ -268,9 +601,9 @@ class GraphRuleEngine:
                             continue
                     except:
                         pass
-                    copy_board = self.play_move(board.copy(), ai_start_pos, ai_end_pos, check=check)
+                    copy_board = self.play_move(board, ai_start_pos, ai_end_pos, check=check)
                     for i in range(strength):
-                        copy_board, turn_score = self.ai_play(copy_board.copy(), f'{ai_type.split("-"[0])}-{opponent_strength}-{opponent_strength-1}', check, True)
+                        copy_board, turn_score = self.ai_play(copy_board, f'{ai_type.split("-"[0])}-{opponent_strength}-{opponent_strength-1}', check, True)
                         try:
                             if mode[1] == 'smart' and turn_score[board.current_team] == -900:
                                 skip_move = True
@@ -307,6 +640,7 @@ class GraphRuleEngine:
                     ai_start_pos, ai_end_pos = random.choice(filtered_moves)
                     new_board = self.play_move(board, ai_start_pos, ai_end_pos, check=check)
 
+        self.last_ai_move = (ai_start_pos, ai_end_pos) if new_board is not start_board else None
         if return_move_score:
             return new_board, self.get_move_score(start_board, ai_start_pos, ai_end_pos)
         return new_board
\ No newline at end of file
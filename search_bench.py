@@ -0,0 +1,59 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import argparse
+import random
+from game_presets import GamePresets
+from search_engines import AlphaBetaSearchEngine, ParallelSearchEngine
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compare alpha-beta node counts at a fixed depth with and without move ordering')
+    parser.add_argument('board', help="a preset (standard, corner, glinski, wrapped), a saved preset such as 'hex/glinski' or a .ucbgame file")
+    parser.add_argument('depth', type=int)
+    parser.add_argument('--tt', type=int, default=0, help='transposition table size in MB, 0 to disable it')
+    parser.add_argument('--quiescence', type=int, default=8, help='capture-depth cap for quiescence search, 0 to disable it')
+    parser.add_argument('--workers', type=int, default=0, help='also time a parallel root-split search with this many worker processes')
+    parser.add_argument('--check', action='store_true', help='pass check=True to move generation')
+    parser.add_argument('--random-moves', type=int, default=0, help='play this many random moves first to reach a middlegame position')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    board, rule_engine = GamePresets.load(args.board)
+    rng = random.Random(args.seed)
+    for _ in range(args.random_moves):
+        team = rule_engine.turn_order[board.current_team_index]
+        moves = sorted(rule_engine.get_all_legal_moves_with_facing(team, board, args.check))
+        if not moves:
+            break
+        rule_engine.make_move(board, *rng.choice(moves))
+
+    for ordering in (False, True):
+        search_engine = AlphaBetaSearchEngine(rule_engine, check=args.check, tt_size_mb=args.tt, ordering=ordering, quiescence_depth=args.quiescence)
+        for depth in range(1, args.depth + 1):
+            result = search_engine.search(board, depth)
+            print(f"ordering {'on ' if ordering else 'off'} depth {depth}: {result.nodes} nodes in {result.elapsed:.3f}s, score {result.score}, best {result.best_move}")
+
+    if args.workers:
+        single = AlphaBetaSearchEngine(rule_engine, check=args.check, tt_size_mb=args.tt, quiescence_depth=args.quiescence).search(board, args.depth)
+        parallel_search_engine = ParallelSearchEngine(rule_engine, args.workers, check=args.check, tt_size_mb=args.tt, quiescence_depth=args.quiescence)
+        # Starting the pool and filling the workers' topology caches are one-off costs, so a shallower search warms them up outside the timing
+        parallel_search_engine.search(board, max(args.depth - 1, 1))
+        parallel = parallel_search_engine.search(board, args.depth)
+        parallel_search_engine.close()
+        print(f'single   depth {args.depth}: {single.nodes} nodes in {single.elapsed:.3f}s, score {single.score}, best {single.best_move}')
+        print(f'{args.workers} workers depth {args.depth}: {parallel.nodes} nodes in {parallel.elapsed:.3f}s, score {parallel.score}, best {parallel.best_move}')
+        print(f'speedup {single.elapsed / max(parallel.elapsed, 1e-9):.2f}x')
@@ -0,0 +1,12 @@
+from .abstract_search_engine import AbstractSearchEngine, SearchResult, SearchTimeout, MATE_SCORE, INFINITY
+from .alpha_beta_search_engine import AlphaBetaSearchEngine
+from .paranoid_search_engine import ParanoidSearchEngine
+from .evaluator import Evaluator
+from .max_n_search_engine import MaxNSearchEngine
+from .monte_carlo_search_engine import MonteCarloSearchEngine
+from .move_ordering import MoveOrdering
+from .opening_book import OpeningBook
+from .parallel_search_engine import ParallelSearchEngine
+from .tablebase import Tablebase, Tablebases
+from .tablebase_generator import TablebaseGenerator
+from .transposition_table import TranspositionTable
\ No newline at end of file
@@ -0,0 +1,114 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import multiprocessing
+import time
+from abc import ABC, abstractmethod
+
+MATE_SCORE = 1000000
+INFINITY = 10 * MATE_SCORE
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchResult:
+    def __init__(self, best_move, score, pv, nodes, depth, elapsed, scores=None):
+        self.best_move = best_move
+        self.score = score
+        # Per-team scores indexed like turn_order, for searches that value every team separately
+        self.scores = scores
+        self.pv = pv
+        self.nodes = nodes
+        self.depth = depth
+        self.elapsed = elapsed
+
+    def nodes_per_second(self):
+        return self.nodes / max(self.elapsed, 1e-9)
+
+    def __str__(self) -> str:
+        return f'SearchResult(depth {self.depth}, score {self.score}, {self.nodes} nodes, pv {self.pv})'
+
+    def __repr__(self) -> str:
+        return self.__str__()
+
+
+class AbstractSearchEngine(ABC):
+    # Worker processes for engines that spread their work out, started by open_pool
+    workers = 0
+    pool = None
+    pool_topology = None
+    pool_check = None
+    # Time after which a timed search gives up, None to search until it is done
+    deadline = None
+
+    @abstractmethod
+    def search(self, board, depth) -> SearchResult:
+        pass
+
+    def open_pool(self, board, initializer, options):
+        # The board topology and rules are sent to each worker once, later work only needs the pieces
+        topology = board.compile()
+        if self.pool != None and self.pool_topology is topology and self.pool_check == self.check:
+            return
+        self.close()
+        self.pool = multiprocessing.Pool(self.workers, initializer, (board.to_compact(), self.rule_engine, options))
+        self.pool_topology = topology
+        self.pool_check = self.check
+
+    def close(self):
+        if self.pool != None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+            self.pool_topology = None
+
+    def is_stopped(self):
+        # Past the deadline, or told to stop through the rule engine's stop_event by another process
+        stop_event = self.rule_engine.stop_event
+        return (self.deadline != None and time.perf_counter() > self.deadline) or (stop_event != None and stop_event.is_set())
+
+    def search_board(self, board):
+        # Search a private copy with its own pieces so an interrupted search never leaves the caller's board mid-move
+        return board.copy(copy_pieces=True)
+
+    def teams_remaining(self, board, royal_numbers):
+        return [team for team in self.rule_engine.turn_order if not self.rule_engine.has_lost(board, team, royal_numbers)]
+
+    def pass_turn(self, board):
+        # Teams that have lost pass their turn instead of being removed from turn_order mid-search
+        current_team_index = board.current_team_index
+        board.current_team_index = (current_team_index + 1) % len(self.rule_engine.turn_order)
+        return current_team_index
+
+    def evaluation_vector(self, board, royal_numbers):
+        vector = []
+        for team in self.rule_engine.turn_order:
+            if self.rule_engine.has_lost(board, team, royal_numbers):
+                vector.append(0)
+            else:
+                vector.append(self.evaluator.score(team))
+        return vector
+
+    def material(self, board, team):
+        rulesets = self.rule_engine.rulesets
+        points = 0
+        for position in board.team_pieces.get(team, []):
+            name = board.get_node_piece(position).name
+            if name in rulesets:
+                points += rulesets[name].points
+        return points
@@ -0,0 +1,326 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import time
+from typing import TYPE_CHECKING
+from graph_board import GraphBoard
+from search_engines.abstract_search_engine import AbstractSearchEngine, SearchResult, SearchTimeout, MATE_SCORE, INFINITY
+from search_engines.transposition_table import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+from search_engines.move_ordering import MoveOrdering
+from search_engines.evaluator import Evaluator
+from search_engines.tablebase import WIN, LOSS
+
+if TYPE_CHECKING:
+    from rule_engines import GraphRuleEngine
+
+
+class AlphaBetaSearchEngine(AbstractSearchEngine):
+    def __init__(self, rule_engine: 'GraphRuleEngine', evaluation='material', check=False, tt_size_mb=16, tt_policy='two_tier', ordering=True, quiescence_depth=8, positional_weight=5):
+        self.rule_engine = rule_engine
+        self.evaluation = evaluation
+        self.check = check
+        self.ordering = ordering
+        # Captures and promotions searched past the horizon, 0 turns quiescence off
+        self.quiescence_depth = quiescence_depth
+        self.nodes = 0
+        # The sib/lib scores depend on the path to a position, so they cannot be shared between transpositions
+        if evaluation in ('sib', 'lib') or not tt_size_mb:
+            self.transposition_table = None
+        else:
+            self.transposition_table = TranspositionTable(tt_size_mb, tt_policy)
+        self.move_ordering = MoveOrdering(rule_engine)
+        self.ordering_hash = None
+        # 'positional' adds piece-square values from board centrality to the material score
+        self.evaluator = Evaluator(rule_engine, positional_weight if evaluation == 'positional' else 0)
+        self.tablebases = None
+        self.moved_independent = set()
+
+    def encode_move(self, move):
+        if move == None:
+            return NO_MOVE
+        topology = self.board.compile()
+        start_pos, end_pos, new_facing = move
+        move_code = topology.position_ids[start_pos] * topology.node_count + topology.position_ids[end_pos]
+        return move_code * topology.direction_count + topology.direction_codes.get(new_facing, 0)
+
+    def decode_move(self, move_code):
+        if move_code == NO_MOVE:
+            return None
+        topology = self.board.compile()
+        move_code, facing = divmod(move_code, topology.direction_count)
+        start_node, end_node = divmod(move_code, topology.node_count)
+        if start_node >= topology.node_count:
+            return None
+        return (topology.positions[start_node], topology.positions[end_node], topology.directions[facing])
+
+    def score_to_table(self, score, ply):
+        # Mate scores are stored relative to the node so they stay valid at any ply
+        if score > MATE_SCORE - 10000:
+            return score + ply
+        elif score < -MATE_SCORE + 10000:
+            return score - ply
+        return score
+
+    def score_from_table(self, score, ply):
+        if score > MATE_SCORE - 10000:
+            return score - ply
+        elif score < -MATE_SCORE + 10000:
+            return score + ply
+        return score
+
+    def move_weight(self, ply):
+        # Same ply weighting as the minmax_sib (Sooner is Better) and minmax_lib (Later is Better) modes
+        if ply == 0:
+            return 1
+        turns = ply // len(self.rule_engine.turn_order)
+        if self.evaluation == 'sib':
+            return 1 / (1 + turns)
+        elif self.evaluation == 'lib':
+            return 1 - 1 / (1 + turns)
+        return 1
+
+    def evaluate(self, team, path_score):
+        if self.evaluation in ('sib', 'lib'):
+            return path_score if team == self.root_team else -path_score
+        return self.evaluator.score(team) - self.evaluator.score(self.opponents[team])
+
+    def tablebase_score(self, entry, ply):
+        result, dtm = entry
+        if result == WIN:
+            return MATE_SCORE - ply - dtm
+        elif result == LOSS:
+            return -MATE_SCORE + ply + dtm
+        return 0
+
+    def start_search(self, board: GraphBoard):
+        turn_order = self.rule_engine.turn_order
+        if len(turn_order) != 2:
+            raise ValueError(f'alpha-beta search needs a two-team turn_order, got {turn_order}')
+
+        self.board = self.search_board(board)
+        self.root_team = turn_order[board.current_team_index]
+        self.opponents = {turn_order[0]: turn_order[1], turn_order[1]: turn_order[0]}
+        self.royal_numbers = self.rule_engine.get_royal_numbers(board)
+        self.evaluator.reset(self.board)
+        # Endgame tables are exact, but the sib/lib scores also depend on the path to a leaf
+        tablebases = self.rule_engine.get_tablebases() if self.evaluation not in ('sib', 'lib') else None
+        self.tablebases = tablebases if tablebases != None and tablebases.load() else None
+        self.moved_independent = self.rule_engine.get_moved_independent_names() if self.tablebases != None else set()
+        self.nodes = 0
+        self.deadline = None
+        self.previous_pv = []
+        self.root_moves = None
+        # Killers and history stay useful for as long as the root position is the same
+        if board.zobrist_hash != self.ordering_hash:
+            self.move_ordering.clear()
+            self.ordering_hash = board.zobrist_hash
+
+        rulesets = self.rule_engine.rulesets
+        promotion_gains = [rulesets[ruleset.promotion].points - ruleset.points for ruleset in rulesets.values() if ruleset.promotion != None]
+        self.max_delta = max(ruleset.points for ruleset in rulesets.values()) + max(promotion_gains + [0]) + 2 * self.evaluator.positional_weight
+
+    def search_root(self, depth, alpha=-INFINITY):
+        self.pv_table = [[] for _ in range(depth + 2)]
+        score = self.negamax(depth, alpha, INFINITY, 0, 0)
+        return score, self.pv_table[0]
+
+    def search(self, board: GraphBoard, depth, root_moves=None, alpha=-INFINITY) -> SearchResult:
+        # root_moves and alpha let a parallel search hand out a share of the root moves and the best score found so far
+        start_time = time.perf_counter()
+        self.start_search(board)
+        self.root_moves = root_moves
+        score, pv = self.search_root(depth, alpha)
+        self.root_moves = None
+
+        best_move = pv[0] if pv else None
+        return SearchResult(best_move, score, pv, self.nodes, depth, time.perf_counter() - start_time)
+
+    def iterative_deepening(self, board: GraphBoard, time_ms, max_depth=64) -> SearchResult:
+        start_time = time.perf_counter()
+        deadline = start_time + time_ms / 1000
+        self.start_search(board)
+
+        result = None
+        for depth in range(1, max_depth + 1):
+            # The first iteration always finishes so there is a move to return
+            self.deadline = deadline if result != None else None
+            try:
+                score, pv = self.search_root(depth)
+            except SearchTimeout:
+                # Only a stop_event can end the first iteration, which leaves no move to return
+                if result == None:
+                    raise
+                break
+
+            result = SearchResult(pv[0] if pv else None, score, pv, self.nodes, depth, time.perf_counter() - start_time)
+            self.previous_pv = pv
+            if not pv or abs(score) > MATE_SCORE - 10000 or time.perf_counter() >= deadline:
+                break
+
+        self.deadline = None
+        result.nodes = self.nodes
+        result.elapsed = time.perf_counter() - start_time
+        return result
+
+    def negamax(self, depth, alpha, beta, ply, path_score):
+        self.nodes += 1
+        if self.nodes & 15 == 0 and self.is_stopped():
+            raise SearchTimeout()
+        self.pv_table[ply] = []
+        board = self.board
+        rule_engine = self.rule_engine
+        team = rule_engine.turn_order[board.current_team_index]
+
+        if rule_engine.has_lost(board, team, self.royal_numbers):
+            return -MATE_SCORE + ply
+        if depth == 0:
+            if self.tablebases != None:
+                entry = self.tablebases.probe(board, rule_engine.turn_order, self.check, self.moved_independent)
+                if entry != None:
+                    return self.tablebase_score(entry, ply)
+            if self.quiescence_depth and self.evaluation not in ('sib', 'lib'):
+                return self.quiescence(alpha, beta, ply, self.quiescence_depth)
+            return self.evaluate(team, path_score)
+
+        transposition_table = self.transposition_table
+        original_alpha = alpha
+        table_move = None
+        if transposition_table != None:
+            key = board.zobrist_hash
+            entry = transposition_table.probe(key)
+            if entry != None:
+                entry_depth, bound, score, move_code = entry
+                table_move = self.decode_move(move_code)
+                if entry_depth >= depth and ply > 0:
+                    score = self.score_from_table(score, ply)
+                    if bound == EXACT:
+                        return score
+                    elif bound == LOWER_BOUND:
+                        alpha = max(alpha, score)
+                    elif bound == UPPER_BOUND:
+                        beta = min(beta, score)
+                    if alpha >= beta:
+                        return score
+
+        moves = rule_engine.get_all_legal_moves_with_facing(team, board, self.check)
+        if ply == 0 and self.root_moves != None:
+            moves = [move for move in moves if move in self.root_moves]
+        if not moves:
+            # Checkmate when moves are checked, otherwise a stalemate or a blocked position
+            if self.check and rule_engine.is_in_check(board, team):
+                return -MATE_SCORE + ply
+            return 0
+        if self.ordering:
+            self.move_ordering.order(board, moves, ply)
+        # The previous iteration's principal variation goes ahead of the transposition table's move
+        for ordered_move in (table_move, self.previous_pv[ply] if ply < len(self.previous_pv) else None):
+            if ordered_move != None and ordered_move in moves and moves[0] != ordered_move:
+                moves.remove(ordered_move)
+                moves.insert(0, ordered_move)
+
+        weighted = self.evaluation in ('sib', 'lib')
+        sign = 1 if team == self.root_team else -1
+        best_score = -INFINITY
+        best_move = None
+        for move in moves:
+            start_pos, end_pos, new_facing = move
+            child_path_score = path_score
+            if weighted:
+                move_score = rule_engine.get_move_score(board, start_pos, end_pos)
+                gain = move_score[team] - move_score[self.opponents[team]]
+                child_path_score += sign * gain * self.move_weight(ply)
+
+            undo = rule_engine.make_move(board, start_pos, end_pos, new_facing)
+            self.evaluator.push(undo)
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1, child_path_score)
+            self.evaluator.pop()
+            rule_engine.unmake_move(board, undo)
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+            if alpha >= beta:
+                if self.ordering:
+                    self.move_ordering.record_cutoff(board, move, ply, depth)
+                break
+
+        # A root searched over only some of its moves has no bound worth storing
+        if transposition_table != None and (ply > 0 or self.root_moves == None):
+            if best_score <= original_alpha:
+                bound = UPPER_BOUND
+            elif best_score >= beta:
+                bound = LOWER_BOUND
+            else:
+                bound = EXACT
+            transposition_table.store(key, depth, bound, self.score_to_table(best_score, ply), self.encode_move(best_move))
+
+        return best_score
+
+    def quiescence(self, alpha, beta, ply, capture_depth):
+        self.nodes += 1
+        if self.nodes & 15 == 0 and self.is_stopped():
+            raise SearchTimeout()
+        board = self.board
+        rule_engine = self.rule_engine
+        team = rule_engine.turn_order[board.current_team_index]
+
+        if rule_engine.has_lost(board, team, self.royal_numbers):
+            return -MATE_SCORE + ply
+        stand_pat = self.evaluate(team, 0)
+        if stand_pat >= beta or capture_depth == 0:
+            return stand_pat
+        # Delta pruning: not even the most valuable capture and promotion could raise alpha
+        if stand_pat + self.max_delta <= alpha:
+            return stand_pat
+        alpha = max(alpha, stand_pat)
+
+        promotion_gain = self.move_ordering.promotion_gain
+        rulesets = rule_engine.rulesets
+        captures = []
+        for move in rule_engine.iter_all_legal_moves(team, board, self.check):
+            start_pos, end_pos, _ = move
+            piece = board.get_node_piece(start_pos)
+            victim = board.get_node_piece(end_pos)
+            gain = promotion_gain(piece, end_pos)
+            if victim != None:
+                gain += rulesets[victim.name].points
+            elif gain == 0:
+                continue
+            if stand_pat + gain <= alpha:
+                continue
+            # MVV-LVA, the same order the main search gives captures
+            captures.append((gain, -rulesets[piece.name].points, move))
+        captures.sort(reverse=True)
+
+        best_score = stand_pat
+        for _, _, (start_pos, end_pos, new_facing) in captures:
+            undo = rule_engine.make_move(board, start_pos, end_pos, new_facing)
+            self.evaluator.push(undo)
+            score = -self.quiescence(-beta, -alpha, ply + 1, capture_depth - 1)
+            self.evaluator.pop()
+            rule_engine.unmake_move(board, undo)
+
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        return best_score
@@ -0,0 +1,118 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+from collections import deque
+from typing import TYPE_CHECKING
+from graph_board import GraphBoard
+
+if TYPE_CHECKING:
+    from rule_engines import GraphRuleEngine
+    from rule_engines.graph_rule_engine import MoveUndo
+
+
+class Evaluator:
+    # Per-team material and piece-square sums, kept up to date from each MoveUndo so a leaf costs O(1)
+    def __init__(self, rule_engine: 'GraphRuleEngine', positional_weight=0, adjacency_type='edge'):
+        self.rule_engine = rule_engine
+        # Points a non-royal piece gains on the most central tile, 0 for material only
+        self.positional_weight = positional_weight
+        self.adjacency_type = adjacency_type
+        self.table_topology = None
+        self.piece_square_table = dict()
+        self.material = dict()
+        self.positional = dict()
+        self.history = []
+
+    def get_centrality(self, board: GraphBoard):
+        # Distance from the nearest boundary tile over adjacency_type, scaled to 0 at the edge and 1 in the middle.
+        # Boundary tiles are the ones with fewer neighbours than the best connected tile, so any board shape works
+        topology = board.compile()
+        centrality = dict()
+        neighbors = topology.get_adjacency_list(self.adjacency_type)
+
+        max_degree = max([len(node_neighbors) for node_neighbors in neighbors] + [0])
+        distances = [-1] * topology.node_count
+        queue = deque()
+        for node, node_neighbors in enumerate(neighbors):
+            if len(node_neighbors) < max_degree:
+                distances[node] = 0
+                queue.append(node)
+        while queue:
+            node = queue.popleft()
+            for neighbor in neighbors[node]:
+                if distances[neighbor] == -1:
+                    distances[neighbor] = distances[node] + 1
+                    queue.append(neighbor)
+
+        max_distance = max(distances + [0])
+        for node, position in enumerate(topology.positions):
+            # Boards without a boundary (e.g. fully wrapped ones) have no centre either
+            centrality[position] = distances[node] / max_distance if max_distance > 0 and distances[node] >= 0 else 0
+        return centrality
+
+    def get_piece_square_table(self, board: GraphBoard):
+        topology = board.compile()
+        if self.table_topology is not topology:
+            centrality = self.get_centrality(board) if self.positional_weight else dict()
+            self.piece_square_table = {position: round(self.positional_weight * value) for position, value in centrality.items()}
+            self.table_topology = topology
+        return self.piece_square_table
+
+    def piece_points(self, name):
+        ruleset = self.rule_engine.rulesets.get(name)
+        return ruleset.points if ruleset != None else 0
+
+    def piece_square(self, piece, position):
+        if piece.is_royal:
+            return 0
+        return self.piece_square_table.get(position, 0)
+
+    def reset(self, board: GraphBoard):
+        self.get_piece_square_table(board)
+        self.material = {team: 0 for team in self.rule_engine.turn_order}
+        self.positional = {team: 0 for team in self.rule_engine.turn_order}
+        self.history = []
+        for team, positions in board.team_pieces.items():
+            for position in positions:
+                piece = board.get_node_piece(position)
+                self.material[team] = self.material.get(team, 0) + self.piece_points(piece.name)
+                self.positional[team] = self.positional.get(team, 0) + self.piece_square(piece, position)
+
+    def push(self, undo: 'MoveUndo'):
+        # Called after make_move, when undo.piece already carries its promoted name
+        piece = undo.piece
+        material_change = self.piece_points(piece.name) - self.piece_points(undo.name)
+        positional_change = self.piece_square(piece, undo.end_pos) - self.piece_square(piece, undo.start_pos)
+        changes = [(team, material_change, positional_change) for team in piece.get_team_names()]
+
+        captured = undo.captured
+        if captured != None:
+            material_change = -self.piece_points(captured.name)
+            positional_change = -self.piece_square(captured, undo.end_pos)
+            changes.extend([(team, material_change, positional_change) for team in captured.get_team_names()])
+
+        for team, material_change, positional_change in changes:
+            self.material[team] = self.material.get(team, 0) + material_change
+            self.positional[team] = self.positional.get(team, 0) + positional_change
+        self.history.append(changes)
+
+    def pop(self):
+        for team, material_change, positional_change in self.history.pop():
+            self.material[team] -= material_change
+            self.positional[team] -= positional_change
+
+    def score(self, team):
+        return self.material.get(team, 0) + self.positional.get(team, 0)
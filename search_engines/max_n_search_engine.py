@@ -0,0 +1,112 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import time
+from typing import TYPE_CHECKING
+from graph_board import GraphBoard
+from search_engines.abstract_search_engine import AbstractSearchEngine, SearchResult, SearchTimeout, INFINITY
+from search_engines.evaluator import Evaluator
+
+if TYPE_CHECKING:
+    from rule_engines import GraphRuleEngine
+
+
+class MaxNSearchEngine(AbstractSearchEngine):
+    # Every team maximises its own entry of the evaluation vector. Entries are non-negative and
+    # sum to at most max_sum, which is what makes shallow pruning safe
+    def __init__(self, rule_engine: 'GraphRuleEngine', check=False):
+        self.rule_engine = rule_engine
+        self.check = check
+        self.nodes = 0
+        self.evaluator = Evaluator(rule_engine)
+
+    def get_max_sum(self, board):
+        rulesets = self.rule_engine.rulesets
+
+        def best_points(name):
+            points = rulesets[name].points if name in rulesets else 0
+            seen = [name]
+            while name in rulesets and rulesets[name].promotion != None and rulesets[name].promotion not in seen:
+                name = rulesets[name].promotion
+                seen.append(name)
+                points = max(points, rulesets[name].points if name in rulesets else 0)
+            return points
+
+        max_sum = 0
+        for position in board.piece_keys.keys():
+            piece = board.get_node_piece(position)
+            teams = [team for team in piece.get_team_names() if team in self.rule_engine.turn_order]
+            max_sum += len(teams) * best_points(piece.name)
+        return max_sum
+
+    def search(self, board: GraphBoard, depth) -> SearchResult:
+        start_time = time.perf_counter()
+        self.board = self.search_board(board)
+        self.root_index = board.current_team_index
+        self.royal_numbers = self.rule_engine.get_royal_numbers(board)
+        self.evaluator.reset(self.board)
+        self.max_sum = self.get_max_sum(board)
+        self.nodes = 0
+        self.pv_table = [[] for _ in range(depth + 2)]
+
+        scores = self.max_n(depth, -INFINITY, 0)
+
+        pv = self.pv_table[0]
+        best_move = pv[0] if pv else None
+        return SearchResult(best_move, scores[self.root_index], pv, self.nodes, depth, time.perf_counter() - start_time, scores)
+
+    def max_n(self, depth, bound, ply):
+        self.nodes += 1
+        if self.nodes & 15 == 0 and self.is_stopped():
+            raise SearchTimeout()
+        self.pv_table[ply] = []
+        board = self.board
+        rule_engine = self.rule_engine
+        turn_order = rule_engine.turn_order
+        team_index = board.current_team_index
+        team = turn_order[team_index]
+
+        remaining = self.teams_remaining(board, self.royal_numbers)
+        if len(remaining) == 1:
+            return [self.max_sum if other == remaining[0] else 0 for other in turn_order]
+        if team not in remaining:
+            current_team_index = self.pass_turn(board)
+            scores = self.max_n(depth, bound, ply)
+            board.current_team_index = current_team_index
+            return scores
+        if depth == 0:
+            return self.evaluation_vector(board, self.royal_numbers)
+
+        moves = rule_engine.get_all_legal_moves_with_facing(team, board, self.check)
+        if not moves:
+            return self.evaluation_vector(board, self.royal_numbers)
+
+        best_scores = None
+        for move in moves:
+            undo = rule_engine.make_move(board, *move)
+            self.evaluator.push(undo)
+            scores = self.max_n(depth - 1, -INFINITY if best_scores == None else best_scores[team_index], ply + 1)
+            self.evaluator.pop()
+            rule_engine.unmake_move(board, undo)
+
+            if best_scores == None or scores[team_index] > best_scores[team_index]:
+                best_scores = scores
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+            # Shallow pruning, the team that moved before us can no longer prefer this branch
+            if best_scores[team_index] >= self.max_sum - bound:
+                break
+
+        return best_scores
@@ -0,0 +1,245 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import math
+import random
+import time
+from typing import TYPE_CHECKING
+from graph_board import GraphBoard
+from graph_board.graph_board import GraphPresets
+from search_engines.abstract_search_engine import AbstractSearchEngine, SearchResult, SearchTimeout
+
+if TYPE_CHECKING:
+    from rule_engines import GraphRuleEngine
+
+PASS = None
+
+# Each worker process keeps its own board and search engine between playout batches
+_worker_board = None
+_worker_search_engine = None
+
+
+def _init_worker(compact_board, rule_engine, options):
+    global _worker_board, _worker_search_engine
+    _worker_board = GraphPresets.from_compact(compact_board)
+    _worker_search_engine = MonteCarloSearchEngine(rule_engine, **options)
+
+
+def _run_playouts(piece_state, royal_numbers, playouts, seed):
+    _worker_board.set_piece_state(piece_state)
+    search_engine = _worker_search_engine
+    search_engine.board = _worker_board
+    search_engine.royal_numbers = royal_numbers
+    rng = random.Random(seed)
+    rewards = [0] * len(search_engine.rule_engine.turn_order)
+    for _ in range(playouts):
+        for i, reward in enumerate(search_engine.playout(rng)):
+            rewards[i] += reward
+    return rewards
+
+
+class MonteCarloNode:
+    def __init__(self, key, team_index, moves, terminal=False):
+        self.key = key
+        self.team_index = team_index
+        self.untried_moves = moves
+        self.terminal = terminal
+        self.children = dict()
+        self.visits = 0
+        # Summed rewards indexed like turn_order
+        self.rewards = None
+
+    def mean_rewards(self):
+        return [reward / max(self.visits, 1) for reward in self.rewards]
+
+
+class MonteCarloSearchEngine(AbstractSearchEngine):
+    # UCT over uniformly random playouts, the same policy as the random ai_type. Every team is
+    # rewarded by how it ranks at the end of a playout, so it works for any number of teams
+    def __init__(self, rule_engine: 'GraphRuleEngine', exploration=1.4, max_playout_moves=200, workers=0, batch_size=None, check=False, seed=None):
+        self.rule_engine = rule_engine
+        self.exploration = exploration
+        self.max_playout_moves = max_playout_moves
+        self.workers = workers
+        # Playouts run per leaf when they are spread over worker processes
+        self.batch_size = batch_size if batch_size else 2 * max(workers, 1)
+        self.check = check
+        self.rng = random.Random(seed)
+        self.root = None
+
+    def create_node(self):
+        board = self.board
+        rule_engine = self.rule_engine
+        team = rule_engine.turn_order[board.current_team_index]
+        if len(self.teams_remaining(board, self.royal_numbers)) < 2:
+            return MonteCarloNode(board.zobrist_hash, board.current_team_index, [], True)
+        if rule_engine.has_lost(board, team, self.royal_numbers):
+            return MonteCarloNode(board.zobrist_hash, board.current_team_index, [PASS])
+        moves = rule_engine.get_all_legal_moves_with_facing(team, board, self.check)
+        return MonteCarloNode(board.zobrist_hash, board.current_team_index, moves if moves else [PASS])
+
+    def play(self, move):
+        if move == PASS:
+            return self.pass_turn(self.board)
+        return self.rule_engine.make_move(self.board, *move)
+
+    def unplay(self, move, undo):
+        if move == PASS:
+            self.board.current_team_index = undo
+        else:
+            self.rule_engine.unmake_move(self.board, undo)
+
+    def outcome(self):
+        # A team scores the share of the other teams it finished ahead of, so a sole survivor scores 1
+        board = self.board
+        turn_order = self.rule_engine.turn_order
+        if len(turn_order) < 2:
+            return [1] * len(turn_order)
+        remaining = self.teams_remaining(board, self.royal_numbers)
+        material = {team: self.material(board, team) if team in remaining else -1 for team in turn_order}
+        rewards = []
+        for team in turn_order:
+            if team not in remaining:
+                rewards.append(0)
+                continue
+            beaten = 0
+            for other in turn_order:
+                if other != team:
+                    if material[other] < material[team]:
+                        beaten += 1
+                    elif material[other] == material[team]:
+                        beaten += 0.5
+            rewards.append(beaten / (len(turn_order) - 1))
+        return rewards
+
+    def playout(self, rng):
+        board = self.board
+        rule_engine = self.rule_engine
+        played = []
+        for _ in range(self.max_playout_moves):
+            if len(self.teams_remaining(board, self.royal_numbers)) < 2:
+                break
+            team = rule_engine.turn_order[board.current_team_index]
+            move = PASS
+            if not rule_engine.has_lost(board, team, self.royal_numbers):
+                moves = rule_engine.get_all_legal_moves_with_facing(team, board, self.check)
+                if moves:
+                    move = rng.choice(moves)
+            played.append((move, self.play(move)))
+
+        rewards = self.outcome()
+        for move, undo in reversed(played):
+            self.unplay(move, undo)
+        return rewards
+
+    def run_playouts(self):
+        if self.pool == None:
+            return self.playout(self.rng), 1
+        piece_state = self.board.get_piece_state()
+        shares = [self.batch_size // self.workers + (1 if i < self.batch_size % self.workers else 0) for i in range(self.workers)]
+        tasks = [(piece_state, self.royal_numbers, share, self.rng.getrandbits(32)) for share in shares if share]
+        rewards = [0] * len(self.rule_engine.turn_order)
+        for worker_rewards in self.pool.starmap(_run_playouts, tasks):
+            for i, reward in enumerate(worker_rewards):
+                rewards[i] += reward
+        return rewards, sum(shares)
+
+    def select_child(self, node):
+        log_visits = math.log(max(node.visits, 1))
+        best_value = -1
+        best = None
+        for move, child in node.children.items():
+            value = child.rewards[node.team_index] / child.visits + self.exploration * math.sqrt(log_visits / child.visits)
+            if value > best_value:
+                best_value = value
+                best = (move, child)
+        return best
+
+    def find_root(self, board: GraphBoard):
+        # Reuse the subtree from the previous search if this position was in it
+        key = board.zobrist_hash
+        frontier = [self.root] if self.root != None else []
+        for _ in range(len(self.rule_engine.turn_order) + 1):
+            next_frontier = []
+            for node in frontier:
+                if node.key == key and node.team_index == board.current_team_index:
+                    return node
+                next_frontier.extend(node.children.values())
+            frontier = next_frontier
+        return None
+
+    def iterate(self):
+        node = self.root
+        path = [node]
+        played = []
+        while not node.terminal and not node.untried_moves and node.children:
+            move, node = self.select_child(node)
+            played.append((move, self.play(move)))
+            path.append(node)
+
+        if node.untried_moves:
+            move = node.untried_moves.pop(self.rng.randrange(len(node.untried_moves)))
+            played.append((move, self.play(move)))
+            child = self.create_node()
+            node.children[move] = child
+            node = child
+            path.append(node)
+
+        if node.terminal:
+            rewards, playouts = self.outcome(), 1
+        else:
+            rewards, playouts = self.run_playouts()
+
+        for path_node in path:
+            path_node.visits += playouts
+            if path_node.rewards == None:
+                path_node.rewards = [0] * len(rewards)
+            for i, reward in enumerate(rewards):
+                path_node.rewards[i] += reward
+
+        for move, undo in reversed(played):
+            self.unplay(move, undo)
+        return playouts
+
+    def search(self, board: GraphBoard, playouts=1000, time_ms=None) -> SearchResult:
+        start_time = time.perf_counter()
+        deadline = start_time + time_ms / 1000 if time_ms != None else None
+        self.board = self.search_board(board)
+        self.royal_numbers = self.rule_engine.get_royal_numbers(board)
+        if self.workers:
+            self.open_pool(board, _init_worker, {'max_playout_moves': self.max_playout_moves, 'check': self.check})
+
+        self.root = self.find_root(board)
+        if self.root == None:
+            self.root = self.create_node()
+        total_playouts = 0
+        while (time_ms == None and total_playouts < playouts) or (deadline != None and time.perf_counter() < deadline):
+            if self.is_stopped():
+                # The tree keeps the playouts so far for the next search from this position
+                raise SearchTimeout()
+            total_playouts += self.iterate()
+            if self.root.terminal:
+                break
+
+        pv = []
+        node = self.root
+        while node.children:
+            move, node = max(node.children.items(), key=lambda item: item[1].visits)
+            pv.append(move)
+        best_move = pv[0] if pv and pv[0] != PASS else None
+        scores = self.root.children[pv[0]].mean_rewards() if pv else None
+        score = scores[board.current_team_index] if scores != None else 0
+        return SearchResult(best_move, score, pv, total_playouts, len(pv), time.perf_counter() - start_time, scores)
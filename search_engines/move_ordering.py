@@ -0,0 +1,86 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+from typing import TYPE_CHECKING
+from graph_board import GraphBoard
+
+if TYPE_CHECKING:
+    from rule_engines import GraphRuleEngine
+
+CAPTURE = 3
+KILLER = 2
+QUIET = 1
+
+
+class MoveOrdering:
+    def __init__(self, rule_engine: 'GraphRuleEngine', killer_slots=2):
+        self.rule_engine = rule_engine
+        self.killer_slots = killer_slots
+        self.clear()
+
+    def clear(self):
+        self.killers = []
+        self.history = dict()
+        self.promotion_tiles = {team: set(tiles) for team, tiles in self.rule_engine.promotion_tiles.items()}
+
+    def get_killers(self, ply):
+        while len(self.killers) <= ply:
+            self.killers.append([])
+        return self.killers[ply]
+
+    def promotion_gain(self, piece, end_pos):
+        ruleset = self.rule_engine.rulesets[piece.name]
+        if ruleset.promotion == None:
+            return 0
+        for team in piece.get_team_names():
+            if end_pos in self.promotion_tiles.get(team, ()):
+                return self.rule_engine.rulesets[ruleset.promotion].points - ruleset.points
+        return 0
+
+    def is_tactical(self, board: GraphBoard, move):
+        start_pos, end_pos, _ = move
+        return board.get_node_piece(end_pos) != None or self.promotion_gain(board.get_node_piece(start_pos), end_pos) > 0
+
+    def score_move(self, board: GraphBoard, move, killers):
+        start_pos, end_pos, _ = move
+        piece = board.get_node_piece(start_pos)
+        victim = board.get_node_piece(end_pos)
+        gain = self.promotion_gain(piece, end_pos)
+        if victim != None or gain > 0:
+            # MVV-LVA: most valuable victim first, then least valuable attacker
+            victim_points = self.rule_engine.rulesets[victim.name].points if victim != None else 0
+            return (CAPTURE, victim_points + gain, -self.rule_engine.rulesets[piece.name].points)
+        if move in killers:
+            return (KILLER, -killers.index(move), 0)
+        return (QUIET, self.history.get((piece.name, start_pos, end_pos), 0), 0)
+
+    def order(self, board: GraphBoard, moves, ply):
+        killers = self.get_killers(ply)
+        moves.sort(key=lambda move: self.score_move(board, move, killers), reverse=True)
+        return moves
+
+    def record_cutoff(self, board: GraphBoard, move, ply, depth):
+        if self.is_tactical(board, move):
+            return
+        killers = self.get_killers(ply)
+        if move in killers:
+            killers.remove(move)
+        killers.insert(0, move)
+        del killers[self.killer_slots:]
+
+        start_pos, end_pos, _ = move
+        key = (board.get_node_piece(start_pos).name, start_pos, end_pos)
+        self.history[key] = self.history.get(key, 0) + depth * depth
@@ -0,0 +1,86 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import ast
+import os
+import sqlite3
+from urllib.request import pathname2url
+
+
+class OpeningBook:
+    # Best moves found by earlier searches, keyed by position hash and engine so later games skip searching them again.
+    # Lookups go through SQLite's primary key index on a memory-mapped file that is only opened on first use. A read-only
+    # book never changes the file, so it plays the same moves however many games look it up at once
+    def __init__(self, path, mmap_mb=256, read_only=False):
+        self.path = path
+        self.mmap_mb = mmap_mb
+        self.read_only = read_only
+        self.connection = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['connection'] = None
+        return state
+
+    def open(self):
+        if self.connection == None:
+            if self.read_only and os.path.isfile(self.path):
+                connection = sqlite3.connect(f'file:{pathname2url(os.path.abspath(self.path))}?mode=ro', uri=True, timeout=30, isolation_level=None)
+            else:
+                if self.read_only:
+                    # Nothing has been recorded yet, so lookups go to an empty book in memory
+                    connection = sqlite3.connect(':memory:', isolation_level=None)
+                else:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    # Autocommit with a busy timeout, since tournament workers write to the same book
+                    connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+                    connection.execute('PRAGMA journal_mode=WAL')
+                    connection.execute('PRAGMA synchronous=NORMAL')
+                connection.execute('CREATE TABLE IF NOT EXISTS book (key INTEGER NOT NULL, engine TEXT NOT NULL, effort INTEGER NOT NULL, score NUMERIC NOT NULL, move TEXT NOT NULL, PRIMARY KEY (key, engine)) WITHOUT ROWID')
+            connection.execute(f'PRAGMA mmap_size={self.mmap_mb * 1024 * 1024}')
+            self.connection = connection
+        return self.connection
+
+    def close(self):
+        if self.connection != None:
+            self.connection.close()
+            self.connection = None
+
+    def to_key(self, zobrist_hash):
+        # SQLite integers are signed 64-bit
+        return zobrist_hash - (1 << 64) if zobrist_hash >= 1 << 63 else zobrist_hash
+
+    def probe(self, zobrist_hash, engine, effort=0):
+        # Returns (move, score, effort) of a search by engine with at least effort (its depth or playouts), or None
+        row = self.open().execute('SELECT move, score, effort FROM book WHERE key = ? AND engine = ? AND effort >= ?', (self.to_key(zobrist_hash), engine, effort)).fetchone()
+        if row == None:
+            return None
+        move, score, effort = row
+        return ast.literal_eval(move), score, effort
+
+    def store(self, zobrist_hash, engine, move, score, effort):
+        # Keeps whichever search of the position put in the most effort
+        if self.read_only:
+            return
+        self.open().execute(
+            'INSERT INTO book (key, engine, effort, score, move) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (key, engine) DO UPDATE SET effort = excluded.effort, score = excluded.score, move = excluded.move WHERE excluded.effort >= book.effort',
+            (self.to_key(zobrist_hash), engine, effort, score, repr(tuple(move))))
+
+    def __len__(self):
+        return self.open().execute('SELECT COUNT(*) FROM book').fetchone()[0]
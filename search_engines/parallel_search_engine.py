@@ -0,0 +1,122 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import queue
+import time
+from typing import TYPE_CHECKING
+from graph_board import GraphBoard
+from graph_board.graph_board import GraphPresets
+from search_engines.abstract_search_engine import AbstractSearchEngine, SearchResult, SearchTimeout, INFINITY
+from search_engines.alpha_beta_search_engine import AlphaBetaSearchEngine
+from search_engines.move_ordering import MoveOrdering
+
+if TYPE_CHECKING:
+    from rule_engines import GraphRuleEngine
+
+# Each worker process keeps its own board and search engine between root move assignments
+_worker_board = None
+_worker_search_engine = None
+_worker_search_id = None
+
+
+def _init_worker(compact_board, rule_engine, options):
+    global _worker_board, _worker_search_engine
+    # Saved rule engines leave out the stop_event, so it comes with the options
+    options = dict(options)
+    rule_engine.stop_event = options.pop('stop_event')
+    _worker_board = GraphPresets.from_compact(compact_board)
+    _worker_search_engine = AlphaBetaSearchEngine(rule_engine, **options)
+
+
+def _search_root_move(search_id, piece_state, depth, move, alpha):
+    global _worker_search_id
+    if search_id != _worker_search_id:
+        _worker_board.set_piece_state(piece_state)
+        _worker_search_id = search_id
+    result = _worker_search_engine.search(_worker_board, depth, [move], alpha)
+    return move, result.score, result.pv, result.nodes
+
+
+class ParallelSearchEngine(AbstractSearchEngine):
+    def __init__(self, rule_engine: 'GraphRuleEngine', workers=None, evaluation='material', check=False, **options):
+        self.rule_engine = rule_engine
+        self.workers = workers if workers else os.cpu_count() or 1
+        self.evaluation = evaluation
+        self.check = check
+        # Passed on to each worker's AlphaBetaSearchEngine
+        self.options = options
+        self.move_ordering = MoveOrdering(rule_engine)
+        self.search_id = 0
+        # Searches positions with nothing worth splitting in this process, created the first time one comes up
+        self.local_engine = None
+
+    def search(self, board: GraphBoard, depth) -> SearchResult:
+        turn_order = self.rule_engine.turn_order
+        if len(turn_order) != 2:
+            raise ValueError(f'parallel search needs a two-team turn_order, got {turn_order}')
+
+        start_time = time.perf_counter()
+        team = turn_order[board.current_team_index]
+        root_board = self.search_board(board)
+        moves = self.rule_engine.get_all_legal_moves_with_facing(team, root_board, self.check)
+        if depth < 1 or len(moves) < 2 or self.rule_engine.has_lost(root_board, team, self.rule_engine.get_royal_numbers(board)):
+            # Nothing worth splitting, so search in this process
+            if self.local_engine == None:
+                self.local_engine = AlphaBetaSearchEngine(self.rule_engine, self.evaluation, self.check, **self.options)
+            self.local_engine.check = self.check
+            return self.local_engine.search(board, depth)
+
+        self.open_pool(board, _init_worker, dict(self.options, evaluation=self.evaluation, check=self.check, stop_event=self.rule_engine.stop_event))
+        self.move_ordering.clear()
+        self.move_ordering.order(root_board, moves, 0)
+        pending = list(reversed(moves))
+        self.search_id += 1
+        piece_state = board.get_piece_state()
+
+        # Keep every worker busy, handing each new root move the best score found so far as its alpha
+        results = queue.Queue()
+        best_score = -INFINITY
+        best_pv = []
+        nodes = 1
+        in_flight = 0
+        stopped = False
+        while pending or in_flight:
+            while pending and in_flight < self.workers:
+                move = pending.pop()
+                self.pool.apply_async(_search_root_move, (self.search_id, piece_state, depth, move, best_score), callback=results.put, error_callback=results.put)
+                in_flight += 1
+
+            result = results.get()
+            in_flight -= 1
+            if isinstance(result, SearchTimeout):
+                # Stopped through the stop_event, which every worker sees, so only the moves in flight are waited for
+                pending = []
+                stopped = True
+                continue
+            if isinstance(result, BaseException):
+                self.close()
+                raise result
+            move, score, pv, move_nodes = result
+            nodes += move_nodes
+            if score > best_score:
+                best_score = score
+                best_pv = pv
+
+        if stopped:
+            raise SearchTimeout()
+        best_move = best_pv[0] if best_pv else None
+        return SearchResult(best_move, best_score, best_pv, nodes, depth, time.perf_counter() - start_time)
@@ -0,0 +1,108 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import time
+from typing import TYPE_CHECKING
+from graph_board import GraphBoard
+from search_engines.abstract_search_engine import AbstractSearchEngine, SearchResult, SearchTimeout, MATE_SCORE, INFINITY
+from search_engines.evaluator import Evaluator
+
+if TYPE_CHECKING:
+    from rule_engines import GraphRuleEngine
+
+
+class ParanoidSearchEngine(AbstractSearchEngine):
+    # Assumes every team outside the root team's alliance plays against it, which turns any
+    # number of teams into a two-sided alpha-beta search
+    def __init__(self, rule_engine: 'GraphRuleEngine', check=False):
+        self.rule_engine = rule_engine
+        self.check = check
+        self.nodes = 0
+        self.evaluator = Evaluator(rule_engine)
+
+    def evaluate(self):
+        vector = self.evaluation_vector(self.board, self.royal_numbers)
+        score = 0
+        for team, points in zip(self.rule_engine.turn_order, vector):
+            score += points if team in self.allies else -points
+        return score
+
+    def search(self, board: GraphBoard, depth) -> SearchResult:
+        start_time = time.perf_counter()
+        turn_order = self.rule_engine.turn_order
+        self.board = self.search_board(board)
+        self.root_team = turn_order[board.current_team_index]
+        self.allies = [team for team in turn_order if team in self.rule_engine.teams[self.root_team].allies]
+        self.royal_numbers = self.rule_engine.get_royal_numbers(board)
+        self.evaluator.reset(self.board)
+        self.nodes = 0
+        self.pv_table = [[] for _ in range(depth + 2)]
+
+        score = self.paranoid(depth, -INFINITY, INFINITY, 0)
+
+        pv = self.pv_table[0]
+        best_move = pv[0] if pv else None
+        return SearchResult(best_move, score, pv, self.nodes, depth, time.perf_counter() - start_time)
+
+    def paranoid(self, depth, alpha, beta, ply):
+        self.nodes += 1
+        if self.nodes & 15 == 0 and self.is_stopped():
+            raise SearchTimeout()
+        self.pv_table[ply] = []
+        board = self.board
+        rule_engine = self.rule_engine
+        team = rule_engine.turn_order[board.current_team_index]
+
+        remaining = self.teams_remaining(board, self.royal_numbers)
+        if self.root_team not in remaining:
+            return -MATE_SCORE + ply
+        if all(other in self.allies for other in remaining):
+            return MATE_SCORE - ply
+        if team not in remaining:
+            current_team_index = self.pass_turn(board)
+            score = self.paranoid(depth, alpha, beta, ply)
+            board.current_team_index = current_team_index
+            return score
+        if depth == 0:
+            return self.evaluate()
+
+        moves = rule_engine.get_all_legal_moves_with_facing(team, board, self.check)
+        if not moves:
+            return self.evaluate()
+
+        maximizing = team in self.allies
+        best_score = -INFINITY if maximizing else INFINITY
+        for move in moves:
+            undo = rule_engine.make_move(board, *move)
+            self.evaluator.push(undo)
+            score = self.paranoid(depth - 1, alpha, beta, ply + 1)
+            self.evaluator.pop()
+            rule_engine.unmake_move(board, undo)
+
+            if maximizing:
+                if score > best_score:
+                    best_score = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                alpha = max(alpha, score)
+            else:
+                if score < best_score:
+                    best_score = score
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+                beta = min(beta, score)
+            if alpha >= beta:
+                break
+
+        return best_score
@@ -0,0 +1,197 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import mmap
+import os
+import pickle
+from graph_board import GraphBoard
+
+DRAW = 0
+WIN = 1
+LOSS = 2
+
+MAGIC = b'UCBTB1'
+TABLEBASE_SUFFIX = '.ucbtb'
+# Entries packed per block, a multiple of 8 so every block ends on a byte boundary
+PACK_BLOCK = 4096
+
+
+def piece_template(piece):
+    # What tells pieces apart in a table, everything in Piece.to_compact but the facing and has_moved
+    return (piece.name, piece.team, piece.is_royal, piece.secondary_team, piece.trinary_team, piece.quadinary_team)
+
+
+def material_name(material):
+    return '_'.join(f'{template[1]}-{template[0]}' for template in material)
+
+
+def pack_values(values, width):
+    # Each value takes width bits, little-endian, so value i starts at bit i * width
+    packed = bytearray()
+    for start in range(0, len(values), PACK_BLOCK):
+        block = 0
+        for offset, value in enumerate(values[start:start + PACK_BLOCK]):
+            block |= value << (offset * width)
+        packed += block.to_bytes((min(PACK_BLOCK, len(values) - start) * width + 7) // 8, 'little')
+    return bytes(packed)
+
+
+def get_index(team_index, placements, node_count, facings):
+    # placements holds (node, facing code) for each slot, in slot order
+    index = team_index
+    for (node, facing), slot_facings in zip(placements, facings):
+        index = (index * node_count + node) * len(slot_facings) + facing
+    return index
+
+
+def write_tablebase(path, header, values):
+    # WDL in the low two bits and distance to mate in plies above them
+    header = dict(header, width=2 + max([value >> 2 for value in values] + [0]).bit_length(), size=len(values))
+    header_bytes = pickle.dumps(header)
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, 'little'))
+        f.write(header_bytes)
+        f.write(pack_values(values, header['width']))
+    os.replace(temporary_path, path)
+
+
+class Tablebase:
+    # One material's win/draw/loss and distance to mate for every placement of its pieces. The header is read when
+    # the table is created and the packed values are memory-mapped on the first lookup
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a tablebase')
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = pickle.loads(f.read(header_length))
+        self.data_start = len(MAGIC) + 8 + header_length
+        # Slot templates in sorted order, the facings each slot can have and the node order of the board
+        self.material = header['material']
+        self.facings = header['facings']
+        self.facing_codes = [{facing: i for i, facing in enumerate(facings)} for facings in self.facings]
+        self.positions = header['positions']
+        self.turn_order = header['turn_order']
+        self.check = header['check']
+        self.width = header['width']
+        self.size = header['size']
+        self.max_dtm = header.get('max_dtm', 0)
+        self.counts = header.get('counts')
+        self.mask = (1 << self.width) - 1
+        self.data = None
+        self.topology = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['data'] = None
+        state['topology'] = None
+        return state
+
+    def open(self):
+        if self.data == None:
+            with open(self.path, 'rb') as f:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.data
+
+    def close(self):
+        if self.data != None:
+            self.data.close()
+            self.data = None
+
+    def get_value(self, index):
+        # Returns (WIN, DRAW or LOSS for the team to move, distance to mate in plies)
+        bit = index * self.width
+        start = self.data_start + (bit >> 3)
+        data = self.open()
+        value = (int.from_bytes(data[start:start + ((bit & 7) + self.width + 7) // 8], 'little') >> (bit & 7)) & self.mask
+        return value & 3, value >> 2
+
+    def matches(self, topology):
+        if self.topology is not topology:
+            if tuple(topology.positions) != self.positions:
+                return False
+            self.topology = topology
+        return True
+
+    def probe(self, board: GraphBoard, pieces):
+        # pieces is [(template, position, piece)] sorted by template, as Tablebases.probe builds it
+        topology = board.compile()
+        if not self.matches(topology):
+            return None
+        placements = []
+        for (_, position, piece), facing_codes in zip(pieces, self.facing_codes):
+            facing = facing_codes.get(piece.facing)
+            if facing == None:
+                return None
+            placements.append((topology.position_ids[position], facing))
+        return self.get_value(get_index(board.current_team_index, placements, len(self.positions), self.facings))
+
+
+class Tablebases:
+    # The tables in a directory, indexed by material, turn order and check the first time one is needed
+    def __init__(self, directory):
+        self.directory = directory
+        self.tables = None
+        self.max_pieces = 0
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['tables'] = None
+        state['max_pieces'] = 0
+        return state
+
+    def load(self):
+        if self.tables == None:
+            self.tables = dict()
+            self.max_pieces = 0
+            if os.path.isdir(self.directory):
+                for name in sorted(os.listdir(self.directory)):
+                    if name.endswith(TABLEBASE_SUFFIX):
+                        self.add(Tablebase(os.path.join(self.directory, name)))
+        return self.tables
+
+    def add(self, table: Tablebase):
+        self.load()
+        self.tables[(table.material, table.turn_order, table.check)] = table
+        self.max_pieces = max(self.max_pieces, len(table.material))
+
+    def get_table(self, material, turn_order, check):
+        return self.load().get((tuple(material), tuple(turn_order), check))
+
+    def close(self):
+        for table in (self.tables or dict()).values():
+            table.close()
+
+    def probe(self, board: GraphBoard, turn_order, check=False, moved_independent=()):
+        # Returns (WIN, DRAW or LOSS for the team to move, distance to mate in plies), or None without a table.
+        # Tables are built with every piece already moved, so a position is only looked up when its unmoved pieces are
+        # all named in moved_independent, as GraphRuleEngine.get_moved_independent_names gives them
+        self.load()
+        if len(board.piece_keys) > self.max_pieces:
+            return None
+        pieces = []
+        for position in board.piece_keys.keys():
+            piece = board.get_node_piece(position)
+            if not piece.has_moved and piece.name not in moved_independent:
+                return None
+            pieces.append((piece_template(piece), position, piece))
+        pieces.sort(key=lambda entry: entry[0])
+        table = self.get_table([template for template, _, _ in pieces], turn_order, check)
+        if table == None:
+            return None
+        return table.probe(board, pieces)
@@ -0,0 +1,469 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import os
+import pickle
+import shutil
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import TYPE_CHECKING
+from graph_board import GraphBoard
+from graph_board.graph_board import GraphPresets
+from piece import Piece
+from search_engines.tablebase import Tablebase, Tablebases, piece_template, material_name, get_index, write_tablebase, DRAW, WIN, LOSS, TABLEBASE_SUFFIX
+
+if TYPE_CHECKING:
+    from rule_engines import GraphRuleEngine
+
+# What a chunk records about each position before the tables are solved
+UNUSED = 0
+LOST = 1
+MATED = 2
+STALEMATE = 3
+PLAYABLE = 4
+
+# Each worker process keeps its own empty board between chunks
+_worker_generator = None
+
+
+def _init_worker(compact_board, rule_engine, directory, check):
+    global _worker_generator
+    _worker_generator = TablebaseGenerator(GraphPresets.from_compact(compact_board), rule_engine, directory, check)
+
+
+def _generate_chunk(material, facings, start, end, path):
+    _worker_generator.generate_chunk(material, facings, start, end, path)
+    return end - start
+
+
+class TablebaseGenerator:
+    # Builds a table for a material by playing every move from every placement once, then solving the resulting
+    # graph backwards from the lost positions. Chunks of placements are generated in worker processes and saved as
+    # they finish, so an interrupted generation picks up from the chunks already on disk. Tables for the materials a
+    # capture or promotion leads to are generated first
+    def __init__(self, board: GraphBoard, rule_engine: 'GraphRuleEngine', directory, check=False, workers=1, chunk_size=20000, progress=None, built=None):
+        if len(rule_engine.turn_order) != 2:
+            raise ValueError(f'tablebases need a two-team turn_order, got {rule_engine.turn_order}')
+        self.rule_engine = rule_engine
+        self.directory = directory
+        self.check = check
+        self.workers = workers
+        self.chunk_size = chunk_size
+        # Called with (material, chunks generated, chunks in total) as a table's chunks are generated, and with
+        # (table, seconds generating, seconds solving) once it is written
+        self.progress = progress
+        self.built = built
+        self.tablebases = Tablebases(directory)
+        self.pool = None
+        self.generating = set()
+
+        # Facings of the pieces on the starting board, which the tables start their facings from
+        self.start_facings = dict()
+        for position in board.piece_keys.keys():
+            piece = board.get_node_piece(position)
+            self.start_facings.setdefault(piece_template(piece), set()).add(piece.facing)
+
+        self.board = board.copy()
+        self.board.clear_pieces()
+        self.board.royal_tiles = {team: [] for team in rule_engine.turn_order}
+        self.board.current_team_index = 0
+        self.topology = self.board.compile()
+        self.facings = dict()
+
+    def get_template(self, team, name):
+        # The template of a piece like the starting board's, for pieces named from the command line
+        for template in sorted(self.start_facings.keys()):
+            if template[0] == name and template[1] == team:
+                return template
+        return piece_template(Piece(name, team))
+
+    def get_royal_numbers(self, material):
+        royal_numbers = {team: 0 for team in self.rule_engine.turn_order}
+        for template in material:
+            if template[2]:
+                for team in set((template[1],) + template[3:]):
+                    royal_numbers[team] = royal_numbers.get(team, 0) + 1
+        return royal_numbers
+
+    def make_piece(self, template, facing):
+        name, team, is_royal, secondary_team, trinary_team, quadinary_team = template
+        return Piece(name, team, facing, is_royal, True, secondary_team, trinary_team, quadinary_team)
+
+    def promote_template(self, template):
+        ruleset = self.rule_engine.rulesets.get(template[0])
+        if ruleset == None or ruleset.promotion == None:
+            return None
+        for team in set((template[1],) + template[3:]):
+            if self.rule_engine.promotion_tiles.get(team):
+                return (ruleset.promotion,) + template[1:]
+        return None
+
+    def init_facings(self, template):
+        # Starts from the piece's facings on the starting board, or its team's when it is not on it
+        if template not in self.facings:
+            start_facings = self.start_facings.get(template)
+            if not start_facings:
+                start_facings = set([facing for other, facings in self.start_facings.items() if other[1] == template[1] for facing in facings])
+            self.facings[template] = set(start_facings or [self.topology.directions[0]])
+        return self.facings[template]
+
+    def extend_facings(self, material):
+        # Every facing a piece can turn to while moving on the empty board, and a promoted piece every facing the
+        # promoting piece reaches its promotion tiles with
+        board = self.board
+        rule_engine = self.rule_engine
+        direction_codes = self.topology.direction_codes
+        pending = list(material)
+        seen = set(material)
+        while pending:
+            template = pending.pop()
+            facings = self.init_facings(template)
+            ruleset = rule_engine.rulesets.get(template[0])
+            if ruleset == None:
+                continue
+            promoted = self.promote_template(template)
+
+            checked = set()
+            while facings - checked:
+                facing = (facings - checked).pop()
+                checked.add(facing)
+                piece = self.make_piece(template, facing)
+                for position in self.topology.positions:
+                    if board.get_node_tile(position) == None:
+                        continue
+                    board.set_node_piece(position, piece)
+                    for end_pos, new_facing in rule_engine.iter_ruleset(position, board, ruleset):
+                        facings.add(new_facing)
+                        if promoted != None and any([end_pos in rule_engine.promotion_tiles.get(team, []) for team in piece.get_team_names()]):
+                            promoted_facings = self.init_facings(promoted)
+                            if new_facing not in promoted_facings or promoted not in seen:
+                                promoted_facings.add(new_facing)
+                                seen.add(promoted)
+                                pending.append(promoted)
+                    board.set_node_piece(position, None)
+        return tuple(tuple(sorted(self.facings[template], key=lambda facing: direction_codes.get(facing, -1))) for template in material)
+
+    def is_decided(self, material, royal_numbers):
+        # Whether a team has already lost with only material left, so its positions never need a table
+        board = self.board
+        positions = [position for position in self.topology.positions if board.get_node_tile(position) != None][:len(material)]
+        for template, position in zip(material, positions):
+            board.set_node_piece(position, self.make_piece(template, self.topology.directions[0]))
+        decided = any([self.rule_engine.has_lost(board, team, royal_numbers) for team in self.rule_engine.turn_order])
+        for position in positions:
+            board.set_node_piece(position, None)
+        return decided
+
+    def get_dependencies(self, material):
+        royal_numbers = self.get_royal_numbers(material)
+        dependencies = []
+        for i, template in enumerate(material):
+            captured = material[:i] + material[i + 1:]
+            if captured and not self.is_decided(captured, royal_numbers) and captured not in dependencies:
+                dependencies.append(captured)
+            promoted = self.promote_template(template)
+            if promoted != None:
+                promoted = tuple(sorted(material[:i] + (promoted,) + material[i + 1:]))
+                if promoted not in dependencies:
+                    dependencies.append(promoted)
+        return dependencies
+
+    def get_path(self, material):
+        return os.path.join(self.directory, material_name(material) + ('-check' if self.check else '') + TABLEBASE_SUFFIX)
+
+    def get_table(self, material) -> Tablebase:
+        table = self.tablebases.get_table(material, self.rule_engine.turn_order, self.check)
+        if table == None:
+            # Another process may have written it since the directory was read
+            self.tablebases.tables = None
+            table = self.tablebases.get_table(material, self.rule_engine.turn_order, self.check)
+        return table
+
+    def get_size(self, facings):
+        size = len(self.rule_engine.turn_order)
+        for slot_facings in facings:
+            size *= self.topology.node_count * len(slot_facings)
+        return size
+
+    def generate(self, material) -> Tablebase:
+        material = tuple(sorted(material))
+        table = self.get_table(material)
+        if table != None:
+            return table
+        if material in self.generating:
+            raise ValueError(f'promotions of {material_name(material)} lead back to it')
+        self.generating.add(material)
+        try:
+            facings = self.extend_facings(material)
+            for dependency in self.get_dependencies(material):
+                self.generate(dependency)
+            return self.build(material, facings)
+        finally:
+            self.generating.discard(material)
+
+    def build(self, material, facings) -> Tablebase:
+        path = self.get_path(material)
+        parts = path + '.parts'
+        size = self.get_size(facings)
+        # Chunks left by a run with other facings or chunk sizes index positions differently
+        manifest = (facings, size, self.chunk_size, self.check)
+        manifest_path = os.path.join(parts, 'manifest.pickle')
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'rb') as f:
+                if pickle.load(f) != manifest:
+                    shutil.rmtree(parts)
+        if not os.path.exists(manifest_path):
+            os.makedirs(parts, exist_ok=True)
+            with open(manifest_path, 'wb') as f:
+                pickle.dump(manifest, f)
+        chunks = [(start, min(start + self.chunk_size, size)) for start in range(0, size, self.chunk_size)]
+        missing = [(start, end) for start, end in chunks if not os.path.exists(os.path.join(parts, f'{start}.pickle'))]
+        generated = len(chunks) - len(missing)
+        if self.progress != None:
+            self.progress(material, generated, len(chunks))
+
+        start_time = time.perf_counter()
+        if self.workers <= 1:
+            for start, end in missing:
+                self.generate_chunk(material, facings, start, end, os.path.join(parts, f'{start}.pickle'))
+                generated += 1
+                if self.progress != None:
+                    self.progress(material, generated, len(chunks))
+        else:
+            pool = self.open_pool()
+            futures = [pool.submit(_generate_chunk, material, facings, start, end, os.path.join(parts, f'{start}.pickle')) for start, end in missing]
+            for future in as_completed(futures):
+                future.result()
+                generated += 1
+                if self.progress != None:
+                    self.progress(material, generated, len(chunks))
+        generate_time = time.perf_counter() - start_time
+
+        values, counts = self.solve(size, [os.path.join(parts, f'{start}.pickle') for start, _ in chunks])
+        header = {
+            'material': material,
+            'facings': facings,
+            'positions': tuple(self.topology.positions),
+            'turn_order': tuple(self.rule_engine.turn_order),
+            'check': self.check,
+            'max_dtm': max([value >> 2 for value in values] + [0]),
+            'counts': tuple(counts)
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        write_tablebase(path, header, values)
+        shutil.rmtree(parts)
+        table = Tablebase(path)
+        self.tablebases.add(table)
+        if self.built != None:
+            self.built(table, generate_time, time.perf_counter() - start_time - generate_time)
+        return table
+
+    def open_pool(self):
+        if self.pool == None:
+            self.pool = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.board.to_compact(), self.rule_engine, self.directory, self.check))
+        return self.pool
+
+    def close(self):
+        if self.pool != None:
+            self.pool.shutdown()
+            self.pool = None
+        self.tablebases.close()
+
+    def generate_chunk(self, material, facings, start, end, path):
+        # Records what every placement from start to end can move to: positions of this table by index, and the
+        # values of positions in other tables, summed up as the shortest win, any draw and the longest loss
+        board = self.board
+        rule_engine = self.rule_engine
+        turn_order = rule_engine.turn_order
+        topology = self.topology
+        positions = topology.positions
+        node_count = topology.node_count
+        royal_numbers = self.get_royal_numbers(material)
+        facing_codes = [{facing: i for i, facing in enumerate(slot_facings)} for slot_facings in facings]
+        pieces = [self.make_piece(template, slot_facings[0]) for template, slot_facings in zip(material, facings)]
+
+        kinds = bytearray(end - start)
+        offsets = array('q', [0])
+        children = array('i')
+        external_wins = array('i')
+        external_draws = bytearray(end - start)
+        external_losses = array('i')
+
+        for index in range(start, end):
+            i = index - start
+            external_win = -1
+            external_loss = -1
+            placements = []
+            rest = index
+            for slot_facings in reversed(facings):
+                rest, facing = divmod(rest, len(slot_facings))
+                rest, node = divmod(rest, node_count)
+                placements.append((node, facing))
+            placements.reverse()
+            team_index = rest
+            slot_positions = [positions[node] for node, _ in placements]
+
+            if len(set(slot_positions)) != len(slot_positions) or not self.can_place(pieces, slot_positions):
+                kinds[i] = UNUSED
+            else:
+                for piece, template, position, (_, facing), slot_facings in zip(pieces, material, slot_positions, placements, facings):
+                    piece.name = template[0]
+                    piece.facing = slot_facings[facing]
+                    piece.has_moved = True
+                    board.set_node_piece(position, piece)
+                board.current_team_index = team_index
+                team = turn_order[team_index]
+
+                if rule_engine.has_lost(board, team, royal_numbers):
+                    kinds[i] = LOST
+                else:
+                    moves = list(rule_engine.iter_all_legal_moves(team, board, self.check))
+                    # Nothing below looks at attacks, and the next placement rebuilds the map anyway
+                    board.attack_map = None
+                    if not moves:
+                        kinds[i] = MATED if self.check and rule_engine.is_in_check(board, team) else STALEMATE
+                    else:
+                        kinds[i] = PLAYABLE
+                    for start_pos, end_pos, new_facing in moves:
+                        moved = slot_positions.index(start_pos)
+                        captured = slot_positions.index(end_pos) if end_pos in slot_positions else -1
+                        undo = rule_engine.make_move(board, start_pos, end_pos, new_facing)
+                        child_team = turn_order[board.current_team_index]
+                        if rule_engine.has_lost(board, child_team, royal_numbers):
+                            external_win = 0
+                        elif captured == -1 and pieces[moved].name == material[moved][0]:
+                            facing = facing_codes[moved].get(pieces[moved].facing)
+                            if facing == None:
+                                raise ValueError(f'{material_name(material)}: a {pieces[moved].name} turned to {pieces[moved].facing}, outside its facings {facings[moved]}')
+                            child_placements = list(placements)
+                            child_placements[moved] = (topology.position_ids[end_pos], facing)
+                            children.append(get_index(board.current_team_index, child_placements, node_count, facings))
+                        else:
+                            child_pieces = sorted([(piece_template(board.get_node_piece(position)), position, board.get_node_piece(position)) for position in board.piece_keys.keys()], key=lambda entry: entry[0])
+                            child_material = tuple([template for template, _, _ in child_pieces])
+                            child_table = self.get_table(child_material)
+                            value = child_table.probe(board, child_pieces) if child_table != None else None
+                            if value == None:
+                                raise ValueError(f'{material_name(material)}: no table has {material_name(child_material)} with the facings reached')
+                            result, dtm = value
+                            if result == LOSS:
+                                external_win = dtm if external_win == -1 else min(external_win, dtm)
+                            elif result == WIN:
+                                external_loss = max(external_loss, dtm)
+                            else:
+                                external_draws[i] = 1
+                        rule_engine.unmake_move(board, undo)
+
+                for position in slot_positions:
+                    board.set_node_piece(position, None)
+
+            offsets.append(len(children))
+            external_wins.append(external_win)
+            external_losses.append(external_loss)
+
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as f:
+            pickle.dump((start, end, kinds, offsets, children, external_wins, external_draws, external_losses), f)
+        os.replace(temporary_path, path)
+
+    def can_place(self, pieces, slot_positions):
+        for piece, position in zip(pieces, slot_positions):
+            tile = self.board.get_node_tile(position)
+            if tile == None or piece.name in (getattr(tile, 'disallowed_pieces', None) or []):
+                return False
+        return True
+
+    def solve(self, size, paths):
+        # Retrograde analysis: positions are settled in order of distance to mate, starting from the lost ones. A
+        # position moving to a settled loss wins one ply later, and one whose moves all reach settled wins loses one
+        # ply after the longest of them. Whatever is left unsettled is a draw
+        kinds = bytearray()
+        offsets = array('q', [0])
+        children = array('i')
+        external_wins = array('i')
+        external_draws = bytearray()
+        external_losses = array('i')
+        for path in paths:
+            with open(path, 'rb') as f:
+                _, _, chunk_kinds, chunk_offsets, chunk_children, chunk_wins, chunk_draws, chunk_losses = pickle.load(f)
+            base = len(children)
+            kinds += chunk_kinds
+            offsets.extend([offset + base for offset in chunk_offsets[1:]])
+            children.extend(chunk_children)
+            external_wins.extend(chunk_wins)
+            external_draws += chunk_draws
+            external_losses.extend(chunk_losses)
+
+        # Parents of each position, in compressed rows
+        parent_starts = array('q', [0]) * (size + 1)
+        for child in children:
+            parent_starts[child + 1] += 1
+        for index in range(size):
+            parent_starts[index + 1] += parent_starts[index]
+        parents = array('i', [0]) * len(children)
+        cursor = array('q', parent_starts)
+        for index in range(size):
+            for edge in range(offsets[index], offsets[index + 1]):
+                child = children[edge]
+                parents[cursor[child]] = index
+                cursor[child] += 1
+
+        results = bytearray(size)
+        dtms = array('i', [0]) * size
+        settled = bytearray(size)
+        remaining = array('i', [offsets[index + 1] - offsets[index] for index in range(size)])
+        longest_loss = array('i', external_losses)
+        buckets = dict()
+        for index in range(size):
+            kind = kinds[index]
+            if kind == LOST or kind == MATED:
+                buckets.setdefault(0, []).append((index, LOSS))
+            elif kind == PLAYABLE:
+                if external_wins[index] != -1:
+                    buckets.setdefault(external_wins[index] + 1, []).append((index, WIN))
+                elif not remaining[index] and not external_draws[index]:
+                    buckets.setdefault(longest_loss[index] + 1, []).append((index, LOSS))
+            else:
+                settled[index] = 1
+
+        dtm = 0
+        while buckets:
+            for index, result in buckets.pop(dtm, []):
+                if settled[index]:
+                    continue
+                settled[index] = 1
+                results[index] = result
+                dtms[index] = dtm
+                for edge in range(parent_starts[index], parent_starts[index + 1]):
+                    parent = parents[edge]
+                    if settled[parent]:
+                        continue
+                    if result == LOSS:
+                        buckets.setdefault(dtm + 1, []).append((parent, WIN))
+                    else:
+                        remaining[parent] -= 1
+                        if dtm > longest_loss[parent]:
+                            longest_loss[parent] = dtm
+                        if not remaining[parent] and not external_draws[parent] and external_wins[parent] == -1:
+                            buckets.setdefault(longest_loss[parent] + 1, []).append((parent, LOSS))
+            dtm += 1
+
+        counts = [0, 0, 0]
+        for index in range(size):
+            if kinds[index] != UNUSED:
+                counts[results[index]] += 1
+        return [dtms[index] << 2 | results[index] for index in range(size)], counts
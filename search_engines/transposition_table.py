@@ -0,0 +1,120 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+from array import array
+
+EXACT = 1
+LOWER_BOUND = 2
+UPPER_BOUND = 3
+NO_MOVE = -1
+
+
+class TranspositionTable:
+    # key (8) + score (4) + depth (2) + bound (1) + move (8)
+    ENTRY_BYTES = 23
+    POLICIES = ('two_tier', 'depth_preferred', 'always_replace')
+
+    def __init__(self, size_mb=16, policy='two_tier'):
+        if policy not in TranspositionTable.POLICIES:
+            raise ValueError(f'Unknown replacement policy {policy!r}, expected one of {TranspositionTable.POLICIES}')
+        self.size_mb = size_mb
+        self.policy = policy
+        # two_tier buckets hold a depth-preferred slot followed by an always-replace slot
+        self.bucket_size = 2 if policy == 'two_tier' else 1
+        self.entry_count = max(self.bucket_size, int(size_mb * 1024 * 1024) // TranspositionTable.ENTRY_BYTES)
+        self.bucket_count = self.entry_count // self.bucket_size
+        self.entry_count = self.bucket_count * self.bucket_size
+
+        self.keys = array('Q', [0]) * self.entry_count
+        self.scores = array('i', [0]) * self.entry_count
+        self.depths = array('h', [0]) * self.entry_count
+        self.bounds = array('B', [0]) * self.entry_count
+        self.moves = array('q', [NO_MOVE]) * self.entry_count
+        self.reset_stats()
+        self.filled = 0
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def clear(self):
+        self.__init__(self.size_mb, self.policy)
+
+    def probe(self, key):
+        # Returns (depth, bound, score, move) or None
+        self.probes += 1
+        index = (key % self.bucket_count) * self.bucket_size
+        collision = False
+        for slot in range(index, index + self.bucket_size):
+            if self.bounds[slot] == 0:
+                continue
+            if self.keys[slot] == key:
+                self.hits += 1
+                return self.depths[slot], self.bounds[slot], self.scores[slot], self.moves[slot]
+            collision = True
+        if collision:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, bound, score, move=NO_MOVE):
+        self.stores += 1
+        index = (key % self.bucket_count) * self.bucket_size
+        slot = index
+
+        if self.policy == 'two_tier':
+            if self.keys[index] != key and self.bounds[index] != 0 and depth < self.depths[index]:
+                slot = index + 1
+        elif self.policy == 'depth_preferred':
+            if self.keys[index] != key and self.bounds[index] != 0 and depth < self.depths[index]:
+                return
+
+        if self.bounds[slot] == 0:
+            self.filled += 1
+        elif self.keys[slot] != key:
+            self.overwrites += 1
+        elif move == NO_MOVE:
+            # Keep the best move from an earlier search of the same position
+            move = self.moves[slot]
+
+        self.keys[slot] = key
+        self.depths[slot] = depth
+        self.bounds[slot] = bound
+        self.scores[slot] = score
+        self.moves[slot] = move
+
+    def stats(self):
+        return {
+            'size_mb': self.size_mb,
+            'policy': self.policy,
+            'entries': self.entry_count,
+            'fill': self.filled / self.entry_count,
+            'probes': self.probes,
+            'hits': self.hits,
+            'hit_rate': self.hits / self.probes if self.probes else 0.0,
+            'collisions': self.collisions,
+            'stores': self.stores,
+            'overwrites': self.overwrites
+        }
+
+    def __str__(self) -> str:
+        stats = self.stats()
+        return f"TranspositionTable({stats['size_mb']}MB {stats['policy']}, fill {stats['fill']:.1%}, hit rate {stats['hit_rate']:.1%}, {stats['collisions']} collisions, {stats['overwrites']} overwrites)"
+
+    def __repr__(self) -> str:
+        return self.__str__()
@@ -0,0 +1,61 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import argparse
+import os
+import time
+from game_presets import GamePresets
+from search_engines import TablebaseGenerator
+from search_engines.tablebase import material_name, DRAW, WIN, LOSS
+
+
+def progress(material, generated, total):
+    # Rewrites one line per table as its chunks are generated
+    print(f'\r{material_name(material)}: {generated} of {total} chunks generated', end='\n' if generated == total else '', flush=True)
+
+
+def built(table, generate_time, solve_time):
+    counts = table.counts
+    print(f'{material_name(table.material)}: +{counts[WIN]} ={counts[DRAW]} -{counts[LOSS]}, longest mate {table.max_dtm} plies, generated in {generate_time:.1f}s, solved in {solve_time:.1f}s')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate endgame tables with win, draw or loss and distance to mate for every placement of a few pieces')
+    parser.add_argument('board', help="a preset (standard, corner, glinski, wrapped), a saved preset such as 'hex/glinski' or a .ucbgame file")
+    parser.add_argument('pieces', nargs='+', help="pieces as team:name, e.g. white:king white:rook black:king")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processes generating chunks of positions at once, 1 generates them in this process')
+    parser.add_argument('--chunk-size', type=int, default=20000, help='positions generated and saved at a time, an interrupted run resumes from the saved chunks')
+    parser.add_argument('--check', action='store_true', help='pass check=True to move generation, so royals cannot be left attacked')
+    parser.add_argument('--directory', help="where the tables go, by default the board's tablebase directory that searches look in")
+    args = parser.parse_args()
+
+    board, rule_engine = GamePresets.load(args.board)
+    if len(rule_engine.turn_order) != 2:
+        parser.error(f'tablebases need a two-team turn_order, {args.board} has {rule_engine.turn_order}')
+    pieces = []
+    for piece in args.pieces:
+        team, _, name = piece.partition(':')
+        if team not in rule_engine.turn_order or name not in rule_engine.rulesets:
+            parser.error(f"{piece} is not team:name with a team in {rule_engine.turn_order} and a piece in {list(rule_engine.rulesets.keys())}")
+        pieces.append((team, name))
+
+    generator = TablebaseGenerator(board, rule_engine, args.directory or rule_engine.tablebase_dir, args.check, args.workers, args.chunk_size, progress, built)
+    start_time = time.perf_counter()
+    try:
+        table = generator.generate([generator.get_template(team, name) for team, name in pieces])
+    finally:
+        generator.close()
+    print(f'{table.path}: {table.size} positions, {table.width} bits each, in {time.perf_counter() - start_time:.1f}s')
@@ -0,0 +1,265 @@
+'''
+Copyright 2023 Sam A. Haygood
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+'''
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from game_presets import GamePresets
+from search_engines import OpeningBook
+
+
+def play_game(board_name, seats, seed, max_moves, check, book='read'):
+    # seats maps each team in turn_order to the ai_type playing it. book is 'read' to only look moves up in the
+    # board's position book, 'write' to also record searches in it and 'off' to search every move. Games are
+    # reproducible from their seed and the book file unless an ai_type has a time budget (id-<ms>, mcts-<ms>ms) or
+    # the book is written, since then they depend on which games finished first
+    random.seed(seed)
+    board, rule_engine = GamePresets.load(board_name)
+    if book == 'off':
+        rule_engine.book_path = None
+    elif book == 'read' and rule_engine.book_path != None:
+        rule_engine.opening_book = OpeningBook(rule_engine.book_path, read_only=True)
+    turn_order = rule_engine.turn_order
+    royal_numbers = rule_engine.get_royal_numbers(board)
+    stats = {team: {'moves': 0, 'time': 0.0, 'nodes': 0, 'search_time': 0.0} for team in turn_order}
+    winner = None
+    reason = None
+    moves = 0
+
+    try:
+        while moves < max_moves:
+            team = turn_order[board.current_team_index]
+            msg = rule_engine.has_lost(board, team, royal_numbers)
+            if msg != None:
+                turn_order.remove(team)
+                reason = msg
+                if len(turn_order) < 2:
+                    break
+                board.current_team_index %= len(turn_order)
+                continue
+
+            rule_engine.last_search_result = None
+            start_time = time.perf_counter()
+            new_board = rule_engine.ai_play(board, seats[team], check)
+            elapsed = time.perf_counter() - start_time
+            if new_board is board:
+                # No move was played, which is a loss when the team is in check and a draw otherwise
+                if check and rule_engine.is_in_check(board, team):
+                    turn_order.remove(team)
+                    reason = f'{team} was checkmated'
+                    if len(turn_order) < 2:
+                        break
+                    board.current_team_index %= len(turn_order)
+                    continue
+                reason = f'{team} has no legal moves'
+                break
+
+            board = new_board
+            moves += 1
+            team_stats = stats[team]
+            team_stats['moves'] += 1
+            team_stats['time'] += elapsed
+            result = rule_engine.last_search_result
+            if result != None:
+                team_stats['nodes'] += result.nodes
+                team_stats['search_time'] += result.elapsed
+    finally:
+        for search_engine in rule_engine.search_engines.values():
+            search_engine.close()
+        if rule_engine.opening_book != None:
+            rule_engine.opening_book.close()
+
+    if len(turn_order) == 1:
+        winner = turn_order[0]
+    elif moves >= max_moves:
+        reason = f'no winner after {max_moves} moves'
+    return {'seats': seats, 'seed': seed, 'book': book, 'winner': winner, 'winner_ai': seats[winner] if winner != None else None, 'reason': reason, 'moves': moves, 'stats': stats}
+
+
+def schedule(teams, ai_types, games):
+    # Two-team boards play every pair of ai_types, swapping sides each game. Other boards rotate every ai_type
+    # through the seats, so with fewer ai_types than teams some play several seats
+    if len(teams) == 2:
+        for first, second in itertools.combinations(ai_types, 2):
+            for game in range(games):
+                seated = (first, second) if game % 2 == 0 else (second, first)
+                yield dict(zip(teams, seated))
+    else:
+        for game in range(games):
+            yield {team: ai_types[(i + game) % len(ai_types)] for i, team in enumerate(teams)}
+
+
+def expected_score(elo):
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_from_score(score):
+    if score <= 0:
+        return -math.inf
+    if score >= 1:
+        return math.inf
+    return 400 * math.log10(score / (1 - score))
+
+
+def score_stats(wins, draws, losses):
+    # Mean score and its per-game variance
+    games = wins + draws + losses
+    score = (wins + draws / 2) / games
+    variance = (wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games
+    return score, variance
+
+
+def elo_interval(wins, draws, losses, z=1.96):
+    games = wins + draws + losses
+    score, variance = score_stats(wins, draws, losses)
+    margin = z * math.sqrt(variance / games)
+    return elo_from_score(score), elo_from_score(score - margin), elo_from_score(score + margin)
+
+
+def sprt_llr(wins, draws, losses, elo0, elo1):
+    # Log-likelihood ratio of elo1 over elo0 in the normal approximation to the game results
+    score, variance = score_stats(wins, draws, losses)
+    if variance == 0:
+        return 0.0
+    score0 = expected_score(elo0)
+    score1 = expected_score(elo1)
+    return (wins + draws + losses) * (score1 - score0) * (2 * score - score0 - score1) / (2 * variance)
+
+
+def pair_results(results, first, second):
+    # first's wins, draws and losses against second, a game neither of them won counting as a draw between them
+    wins = draws = losses = 0
+    for result in results:
+        seated = set(result['seats'].values())
+        if first not in seated or second not in seated or first == second:
+            continue
+        if result['winner_ai'] == first:
+            wins += 1
+        elif result['winner_ai'] == second:
+            losses += 1
+        else:
+            draws += 1
+    return wins, draws, losses
+
+
+def report(results, ai_types):
+    print(f'{len(results)} games')
+    for ai_type in ai_types:
+        wins = draws = losses = 0
+        moves = 0
+        move_time = nodes = search_time = 0
+        for result in results:
+            teams = [team for team, seat in result['seats'].items() if seat == ai_type]
+            if not teams:
+                continue
+            if result['winner_ai'] == ai_type:
+                wins += 1
+            elif result['winner'] == None:
+                draws += 1
+            else:
+                losses += 1
+            for team in teams:
+                team_stats = result['stats'][team]
+                moves += team_stats['moves']
+                move_time += team_stats['time']
+                nodes += team_stats['nodes']
+                search_time += team_stats['search_time']
+        latency = f'{1000 * move_time / moves:.1f} ms/move' if moves else 'no moves'
+        speed = f', {nodes / search_time:.0f} nodes/s' if nodes and search_time > 0 else ''
+        print(f'{ai_type}: +{wins} ={draws} -{losses}, {latency}{speed}')
+
+    for first, second in itertools.combinations(ai_types, 2):
+        wins, draws, losses = pair_results(results, first, second)
+        if wins + draws + losses:
+            elo, low, high = elo_interval(wins, draws, losses)
+            print(f'{first} vs {second}: +{wins} ={draws} -{losses}, elo {elo:+.1f} (95% {low:+.1f} to {high:+.1f})')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Play ai_types against each other headlessly and report results and Elo differences')
+    parser.add_argument('board', help="a preset (standard, corner, glinski, wrapped), a saved preset such as 'hex/glinski' or a .ucbgame file")
+    parser.add_argument('ai_types', nargs='+', help="two or more ai_types, e.g. random alphabeta-2 'mcts-500'")
+    parser.add_argument('--games', type=int, default=10, help='games per pair of ai_types on two-team boards, otherwise in total')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='processes playing games at once, 1 plays them in this process')
+    parser.add_argument('--seed', type=int, default=0, help='base seed each game derives its own seed from')
+    parser.add_argument('--max-moves', type=int, default=300, help='moves after which a game is a draw')
+    parser.add_argument('--check', action='store_true', help='pass check=True to the ai_types, so royals cannot be left attacked')
+    parser.add_argument('--book', action='store_true', help="also record searches in the board's position book, which makes games depend on the order they finish in")
+    parser.add_argument('--no-book', action='store_true', help="search every move instead of looking it up in the board's position book")
+    parser.add_argument('--output', help='append one JSON line per finished game to this file')
+    parser.add_argument('--sprt', nargs=2, type=float, metavar=('ELO0', 'ELO1'), help='stop once an SPRT accepts that the first ai_type is ELO0 or ELO1 stronger than the second')
+    parser.add_argument('--alpha', type=float, default=0.05, help='SPRT false positive rate')
+    parser.add_argument('--beta', type=float, default=0.05, help='SPRT false negative rate')
+    args = parser.parse_args()
+
+    if len(args.ai_types) < 2:
+        parser.error('at least two ai_types are needed')
+    if len(set(args.ai_types)) != len(args.ai_types):
+        parser.error('results are kept per ai_type, so each one can only be given once')
+    if args.sprt and len(args.ai_types) != 2:
+        parser.error('--sprt compares exactly two ai_types')
+    if args.book and args.no_book:
+        parser.error('--book and --no-book cannot be combined')
+
+    _, rule_engine = GamePresets.load(args.board)
+    book = 'off' if args.no_book else 'write' if args.book else 'read'
+    games = [(args.board, seats, random.Random(f'{args.seed}-{game}').getrandbits(32), args.max_moves, args.check, book) for game, seats in enumerate(schedule(list(rule_engine.turn_order), args.ai_types, args.games))]
+    lower_bound = math.log(args.beta / (1 - args.alpha))
+    upper_bound = math.log((1 - args.beta) / args.alpha)
+
+    output = open(args.output, 'a') if args.output else None
+    results = []
+
+    def finish(game, result):
+        # Returns True once the SPRT has decided
+        result['game'] = game
+        result['board'] = args.board
+        results.append(result)
+        if output != None:
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+        outcome = f"{result['winner']} ({result['winner_ai']}) won" if result['winner'] != None else 'draw'
+        print(f"game {game}: {outcome} after {result['moves']} moves, {result['reason']}")
+        if args.sprt:
+            llr = sprt_llr(*pair_results(results, *args.ai_types), *args.sprt)
+            if llr <= lower_bound or llr >= upper_bound:
+                print(f"SPRT accepts elo {args.sprt[1] if llr >= upper_bound else args.sprt[0]:+g} (llr {llr:.2f}, bounds {lower_bound:.2f} to {upper_bound:.2f})")
+                return True
+        return False
+
+    try:
+        if args.workers <= 1:
+            for game, arguments in enumerate(games):
+                if finish(game, play_game(*arguments)):
+                    break
+        else:
+            # Executor workers are not daemonic, so ai_types with their own process pools (parallel_N, mcts_N) still work
+            with ProcessPoolExecutor(args.workers) as executor:
+                futures = {executor.submit(play_game, *arguments): game for game, arguments in enumerate(games)}
+                for future in as_completed(futures):
+                    if finish(futures[future], future.result()):
+                        executor.shutdown(wait=True, cancel_futures=True)
+                        break
+    finally:
+        if output != None:
+            output.close()
+
+    report(results, args.ai_types)
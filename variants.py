@@ -16,9 +16,26 @@ limitations under the License.
 
 from tile import Tile
 from piece import Piece
+import os
 import pickle
 import copy
-from render_engines import GraphRenderEngine
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from render_engines import GraphRenderEngine
+
+class HeadlessGame:
+    def __init__(self, board, rule_engine, illegal_moves=False):
+        self.board = board
+        self.rule_engine = rule_engine
+        self.illegal_moves = illegal_moves
+
+class HeadlessUnpickler(pickle.Unpickler):
+    # Saved games pickle a whole GraphRenderEngine, load them without importing pygame or OpenGL
+    def find_class(self, module, name):
+        if module == 'render_engines.graph_render_engine' and name == 'GraphRenderEngine':
+            return HeadlessGame
+        return super().find_class(module, name)
 
 class Variants:
     def save(name, render_engine, file_path = 'presets'):
@@ -31,10 +48,33 @@ class Variants:
                 pickle.dump(render_engine, f)
         print(f'{name} Preset Saved')
 
-    def load(name, file_path = 'presets') -> GraphRenderEngine:
+    def load(name, file_path = 'presets') -> 'GraphRenderEngine':
         path = f"saved/{file_path}/{name}.ucbgame"
         with open(path, 'rb') as f:
             preset = pickle.load(f)
+        if preset.rule_engine.book_path == None:
+            preset.rule_engine.book_path = Variants.book_path(path)
+        if preset.rule_engine.tablebase_dir == None:
+            preset.rule_engine.tablebase_dir = Variants.tablebase_dir(path)
         print(f'{name} Preset Loaded')
         return preset
 
+    def load_headless(name, file_path = 'presets') -> HeadlessGame:
+        return Variants.read_headless(f"saved/{file_path}/{name}.ucbgame")
+
+    def read_headless(path) -> HeadlessGame:
+        with open(path, 'rb') as f:
+            game = HeadlessUnpickler(f).load()
+        if game.rule_engine.book_path == None:
+            game.rule_engine.book_path = Variants.book_path(path)
+        if game.rule_engine.tablebase_dir == None:
+            game.rule_engine.tablebase_dir = Variants.tablebase_dir(path)
+        return game
+
+    def book_path(path):
+        # Each saved game keeps the positions its searches found next to it
+        return os.path.splitext(path)[0] + '.ucbbook'
+
+    def tablebase_dir(path):
+        return os.path.splitext(path)[0] + '_tablebases'
+